@@ -1,39 +1,83 @@
 import tkinter as tk
 from tkinter import messagebox, simpledialog, filedialog
+import os
 import threading
 import time
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, List, Optional
 
-import cv2
-import numpy as np
-from PIL import Image, ImageTk
-
-from attendance import AttendanceManager
-from face_db import FaceDatabase
+from config import load_config
 from gui import AppUI
+from metrics import STARTUP, MetricsExporter
+from pipeline import Pipeline
+
+if TYPE_CHECKING:
+    from attendance import AttendanceManager
+    from capture import CaptureSource, FrameMux
+    from checkin import AutoCheckIn
+    from display import PreviewBuffer
+    from enrollment import EnrollmentSession
+    from engine import RecognitionEngine
+    from face_db import FaceDatabase
 
 
 class FaceRecognitionApp:
     def __init__(self):
-        # UI root
+        # Staged startup: only tkinter is loaded before the window appears.
+        # cv2/numpy/PIL, the templates, the cascade, the attendance store and
+        # the cameras are loaded by load_backend on a background thread, and
+        # on_backend_ready wires them in on the Tk thread. Until then the
+        # buttons that need them say so. STARTUP.report() is printed when ready.
         self.main_window = tk.Tk()
+        self.config = load_config()
 
-        # Face detection
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        # Recognition engine owns the cascade, database, tracker and attendance;
+        # the app only feeds it frames and renders its results. Attendance is
+        # written off the Tk thread by a group-committing writer.
+        self.engine: Optional["RecognitionEngine"] = None
+        self.db: Optional["FaceDatabase"] = None
+        self.attendance: Optional["AttendanceManager"] = None
 
-        # Database and attendance managers
-        self.db = FaceDatabase()
-        self.db.load()
-        self.attendance = AttendanceManager()
+        # Auto check-in (off by default): logs after N consecutive recognized
+        # frames, with a per-person cooldown. Manual confirm stays available.
+        self.auto_checkin: Optional["AutoCheckIn"] = None
+        self.auto_checkin_enabled = False
+        self.recognition_threshold = 0.6  # applied to the engine once it is loaded
 
         # Runtime state
-        self.cap: Optional[cv2.VideoCapture] = None
+        self.ready = False
+        self.closing = False
+        self.sources: List["CaptureSource"] = []
         self.is_running = False
         self.current_detection: Optional[str] = None
-        self.recognition_threshold = 0.6  # 0-1, higher = stricter
+        self.current_source: Optional[str] = None
         self.paused = False
-
-        # Build UI via AppUI and start camera
+        self.pipeline: Optional[Pipeline] = None
+        self.retraining = False
+        self.enrollment: Optional["EnrollmentSession"] = None  # set while adding a person from the live view
+        self._enrollment_detect_interval = 0  # preview tracker's detect_interval to restore afterwards
+
+        # Preview: the render stage fills a reusable RGB buffer and a Tk tick
+        # at preview_fps shows the newest frame and applies the latest
+        # status/result text, whatever rate recognition runs at
+        display = self.config.get("display", {})
+        self.preview_fps = float(display.get("preview_fps", 30))
+        self.preview_size = (int(display.get("width", 640)), int(display.get("height", 480)))
+        self.preview: Optional["PreviewBuffer"] = None
+        self.preview_photo = None
+        self._ui_state: Optional[tuple] = None  # (status, result, show_buttons) from the recognition thread
+        self._ui_state_version = 0
+        self._ui_state_applied = 0
+
+        # Metrics snapshot file every few seconds; FACEATTEND_METRICS_PORT also
+        # serves them over local HTTP, FACEATTEND_PROFILE=1 starts the sampler
+        port = os.environ.get("FACEATTEND_METRICS_PORT")
+        self.metrics_exporter = MetricsExporter(http_port=int(port) if port else None)
+        self.metrics_exporter.start()
+        if os.environ.get("FACEATTEND_PROFILE"):
+            self.metrics_exporter.profiler.start()
+
+        # Build UI via AppUI; the camera starts once the backend is loaded
         self.ui = AppUI(
             self.main_window,
             on_confirm=self.confirm_identity,
@@ -44,111 +88,234 @@ class FaceRecognitionApp:
             on_clear_db=self.clear_database,
             on_export_attendance=self.export_attendance_csv,
             on_threshold_change=self.update_threshold,
+            on_auto_checkin_toggle=self.toggle_auto_checkin,
+            on_stop_enrollment=self.finish_enrollment,
             initial_threshold=self.recognition_threshold,
+            initial_auto_checkin=self.auto_checkin_enabled,
         )
-        self.start_camera()
+        self.update_status("Starting...", force=True)
+        self.main_window.after_idle(lambda: STARTUP.mark("window"))
+        threading.Thread(target=self.load_backend, name="startup", daemon=True).start()
 
-    def start_camera(self):
+    def load_backend(self):
+        # Background thread. The cameras open on a second thread meanwhile,
+        # since a device open is often the slowest step of all.
         try:
-            self.cap = cv2.VideoCapture(0)
-            if not self.cap.isOpened():
-                messagebox.showerror("Error", "Could not open camera!")
-                return
-
-            self.is_running = True
-            self.camera_thread = threading.Thread(target=self.update_camera, daemon=True)
-            self.camera_thread.start()
-
+            with STARTUP.stage("imports"):
+                from attendance import AttendanceManager
+                from capture import FrameMux
+                from checkin import AutoCheckIn
+                from detection import DetectorConfig
+                from display import PreviewBuffer
+                from engine import RecognitionEngine
+                from face_db import FaceDatabase
+                from matcher import TemplateConfig
+
+            mux = FrameMux()
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="startup-camera") as pool:
+                opening = pool.submit(self.open_sources, mux)
+                with STARTUP.stage("templates"):
+                    db = FaceDatabase(template_config=TemplateConfig.from_dict(self.config.get("templates", {})))
+                    db.load()
+                with STARTUP.stage("attendance"):
+                    attendance = AttendanceManager(async_writes=True)
+                    auto_checkin = AutoCheckIn(attendance, enabled=self.auto_checkin_enabled,
+                                               on_checkin=self.on_auto_checkin)
+                with STARTUP.stage("cascade"):
+                    engine = RecognitionEngine(
+                        db=db,
+                        attendance=attendance,
+                        detector_config=DetectorConfig.from_dict(self.config.get("detection", {})),
+                    )
+                with STARTUP.stage("warm-up"):
+                    engine.warm_up()
+                preview = PreviewBuffer(self.preview_size, max_fps=self.preview_fps)
+                sources = opening.result()
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to start camera: {str(e)}")
-
-    def update_camera(self):
-        while self.is_running:
-            try:
-                ret, frame = self.cap.read()
-                if not ret:
-                    continue
-
-                frame = cv2.flip(frame, 1)
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-                faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
-
-                if len(faces) > 0:
-                    if not self.paused:
-                        self.process_faces(frame, gray, faces)
-                else:
-                    self.current_detection = None
-                    if not self.paused:
-                        self.main_window.after(0, lambda: self.update_status("Looking for faces..."))
-                        self.main_window.after(0, lambda: self.update_result("No face detected"))
+            self.main_window.after(0, lambda err=e: self._backend_failed(err))
+            return
 
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                frame_pil = Image.fromarray(frame_rgb)
-                frame_tk = ImageTk.PhotoImage(frame_pil.resize((640, 480)))
+        if self.closing:
+            for source in sources:
+                source.stop()
+            attendance.close()
+            return
+        self.main_window.after(0, lambda: self.on_backend_ready(engine, auto_checkin, preview, mux, sources))
 
-                self.main_window.after(0, lambda: self.update_camera_display(frame_tk))
+    def open_sources(self, mux: "FrameMux") -> List["CaptureSource"]:
+        # Every configured source ("capture": {"sources": [...]}, default camera 0)
+        # is read on its own thread into one mux feeding the shared engine.
+        from capture import CaptureSource, parse_sources
 
-                time.sleep(0.033)
+        sources = []
+        with STARTUP.stage("camera"):
+            try:
+                specs = parse_sources(self.config.get("capture", {}).get("sources", [0]))
+                for spec in specs:
+                    source = CaptureSource(spec["source"], mux, tag=spec.get("tag"), flip=spec.get("flip", True))
+                    if source.open():
+                        sources.append(source)
+                    else:
+                        print(f"Could not open capture source {spec['source']!r}")
+                        source.stop()
             except Exception as e:
-                print(f"Camera update error: {e}")
-                continue
+                print(f"Failed to open capture sources: {e}")
+        return sources
+
+    def on_backend_ready(self, engine, auto_checkin, preview, mux, sources):
+        # Tk thread
+        from PIL import ImageTk
+
+        self.engine = engine
+        self.engine.recognition_threshold = self.recognition_threshold
+        self.engine.subscribe(self.on_frame_result)
+        self.db = engine.db
+        self.attendance = engine.attendance
+        self.auto_checkin = auto_checkin
+        self.auto_checkin.enabled = self.auto_checkin_enabled
+        self.engine.subscribe(self.auto_checkin.on_frame_result)
+        self.sync_confirm_frames()
+
+        self.preview = preview
+        self.preview_photo = ImageTk.PhotoImage("RGB", self.preview.size)
+        self.update_camera_display(self.preview_photo)
+        self.ready = True
+        self.update_status("Looking for faces...", force=True)
+        self.start_camera(mux, sources)
+        STARTUP.mark("ready")
+        print(STARTUP.report())
+
+    def _backend_failed(self, error):
+        messagebox.showerror("Error", f"Failed to start: {str(error)}")
+        self.update_status("Startup failed", force=True)
+
+    def require_ready(self, title):
+        # Guard for buttons pressed while load_backend is still running
+        if not self.ready:
+            messagebox.showinfo(title, "Still loading the face database, please try again in a moment.")
+        return self.ready
+
+    def require_not_retraining(self, title):
+        # The database merges writes made during a retrain, but adding or
+        # clearing people mid-retrain is still refused to keep the result obvious
+        if self.retraining:
+            messagebox.showinfo(title, "Retraining is in progress, please try again when it finishes.")
+        return not self.retraining
+
+    def start_camera(self, mux, sources):
+        # The first source is the one previewed and used for enrollment.
+        self.sources = sources
+        if not self.sources:
+            messagebox.showerror("Error", "Could not open camera!")
+            return
+        try:
+            self.is_running = True
+            for source in self.sources:
+                source.start()
+            self.pipeline = Pipeline()
+            self.pipeline.add_stage("detect", self.detect_faces, inbox=mux)
+            self.pipeline.add_stage("recognize", self.recognize_faces)
+            self.pipeline.add_stage("render", self.render_frame)
+            self.pipeline.start()
+            self.main_window.after(1000, self.refresh_pipeline_stats)
+            self.ui_tick()
 
-    def process_faces(self, frame, gray, faces):
-        if self.paused:
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to start camera: {str(e)}")
+
+    # Pipeline stages: each runs on its own thread and hands a packet dict
+    # to the next through a drop-oldest queue, so a slow stage only drops
+    # frames instead of stalling the ones before it
+
+    def source_tag(self, packet):
+        # Records and results only carry a source tag when there is more than one camera
+        return packet["source"] if len(self.sources) > 1 else None
+
+    def detect_faces(self, packet):
+        packet["gray"] = self.engine.to_gray(packet["frame"])
+        packet["tracks"] = self.engine.track(packet["gray"], self.source_tag(packet))
+        packet["frame_index"] = self.engine.tracker_for(self.source_tag(packet)).frame_index
+        return packet
+
+    def recognize_faces(self, packet):
+        # Results reach the UI through on_frame_result. While a person is being
+        # enrolled, the previewed source's faces go to the session instead.
+        session = self.enrollment
+        if session is not None and packet["source"] == self.sources[0].tag:
+            if session.offer(packet["gray"], packet["tracks"], packet["frame_index"]) and session.done:
+                self.main_window.after(0, self.finish_enrollment)
+            session.annotate(packet["frame"])
+            self.post_ui_state(f"Enrolling {session.name}: {session.progress}", session.hint)
+            return packet
+        if not self.paused:
+            result = self.engine.recognize(packet["gray"], packet["tracks"], self.source_tag(packet))
+            self.engine.annotate(packet["frame"], result)
+        return packet
+
+    def render_frame(self, packet):
+        if packet["source"] != self.sources[0].tag:
+            return None
+        self.preview.submit(packet["frame"])
+        return packet
+
+    def ui_tick(self):
+        # Tk thread, every 1/preview_fps: paste the newest preview frame into
+        # the one PhotoImage and apply the latest recognition state
+        if not self.is_running:
             return
-        for (x, y, w, h) in faces:
-            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-            face_roi = gray[y:y + h, x:x + w]
-
-            if len(self.db.face_templates) > 0:
-                try:
-                    face_resized = cv2.resize(face_roi, (100, 100))
-                    face_float = np.float32(face_resized)
-
-                    best_match = None
-                    best_score = -1.0
-
-                    for name, template in self.db.face_templates.items():
-                        result = cv2.matchTemplate(face_float, template, cv2.TM_CCOEFF_NORMED)
-                        max_val = float(np.max(result))
-                        print(f"Comparing against {name}: correlation = {max_val:.3f}")
-                        if max_val > self.recognition_threshold and max_val > best_score:
-                            best_score = max_val
-                            best_match = name
-
-                    print(f"Best match: {best_match} with score {best_score:.3f} (threshold: {self.recognition_threshold:.3f})")
-
-                    if best_match is not None:
-                        self.current_detection = best_match
-                        if not self.paused:
-                            self.main_window.after(0, lambda: self.update_status("Face detected!"))
-                            self.main_window.after(0, lambda n=best_match: self.update_result(f"Hello, {n}!", True))
-                        cv2.putText(
-                            frame,
-                            f"{best_match} ({best_score:.2f})",
-                            (x, y - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX,
-                            0.7,
-                            (0, 255, 0),
-                            2,
-                        )
-                    else:
-                        self.handle_unknown_face()
-                except Exception as e:
-                    print(f"Recognition error: {e}")
-                    self.handle_unknown_face()
+        image = self.preview.take_image()
+        if image is not None:
+            self.preview_photo.paste(image)
+        if self._ui_state_version != self._ui_state_applied:
+            self._ui_state_applied = self._ui_state_version
+            status, result, show_buttons = self._ui_state
+            self.update_status(status)
+            self.update_result(result, show_buttons)
+        self.main_window.after(max(1, int(1000 / self.preview_fps)), self.ui_tick)
+
+    def post_ui_state(self, status, result, show_buttons=False):
+        # Recognition thread: only the latest state is kept; ui_tick applies it
+        self._ui_state = (status, result, show_buttons)
+        self._ui_state_version += 1
+
+    def refresh_pipeline_stats(self):
+        if not self.is_running or self.pipeline is None:
+            return
+        stats = self.pipeline.stats()
+        parts = [f"{source.tag}: {source.fps:.0f} fps" for source in self.sources]
+        parts += [f"{name}: {st['fps']:.0f} fps (q {st['queue_depth']})" for name, st in stats.items()]
+        self.ui.update_pipeline_stats("  ".join(parts))
+        self.main_window.after(1000, self.refresh_pipeline_stats)
+
+    def on_frame_result(self, result):
+        # Engine subscriber; called on the recognition thread
+        if self.paused or self.enrollment is not None:
+            return
+        if not result.detections:
+            if self.current_detection and result.source != self.current_source:
+                return  # another camera is empty; keep the face shown from this one
+            self.current_detection = None
+            self.post_ui_state("Looking for faces...", "No face detected")
+            return
+        if result.database_empty:
+            self.post_ui_state("Face detected - Database empty", "Unknown person")
+            return
+
+        show_buttons = not self.auto_checkin.enabled
+        where = f" ({result.source})" if result.source else ""
+        for det in result.detections:
+            if det.recognized:
+                self.current_detection = det.name
+                self.current_source = result.source
+                self.post_ui_state(f"Face detected!{where}", f"Hello, {det.name}!", show_buttons)
             else:
-                if not self.paused:
-                    self.main_window.after(0, lambda: self.update_status("Face detected - Database empty"))
-                    self.main_window.after(0, lambda: self.update_result("Unknown person"))
+                self.handle_unknown_face()
 
     def handle_unknown_face(self):
         if self.paused:
             return
         self.current_detection = None
-        self.main_window.after(0, lambda: self.update_status("Face detected"))
-        self.main_window.after(0, lambda: self.update_result("Unknown person"))
+        self.post_ui_state("Face detected", "Unknown person")
 
     def update_camera_display(self, frame_tk):
         self.ui.update_camera_display(frame_tk)
@@ -166,11 +333,30 @@ class FaceRecognitionApp:
     def confirm_identity(self):
         if self.current_detection:
             messagebox.showinfo("Confirmed", f"Welcome, {self.current_detection}!")
-            rec = self.attendance.log(self.current_detection)
+            rec = self.attendance.log(self.current_detection, source=self.current_source)
+            self.auto_checkin.mark(rec["name"])
             print(f"Attendance logged: {rec['name']} at {rec['timestamp']}")
             self.current_detection = None
             self.ui.hide_confirm_buttons()
 
+    def on_auto_checkin(self, record):
+        # Called on the recognition thread
+        self.main_window.after(0, lambda: self.update_status(f"Checked in: {record['name']}"))
+
+    def toggle_auto_checkin(self, enabled):
+        self.auto_checkin_enabled = bool(enabled)
+        if self.auto_checkin is not None:
+            self.auto_checkin.enabled = self.auto_checkin_enabled
+            self.sync_confirm_frames()
+        if enabled:
+            self.ui.hide_confirm_buttons()
+
+    def sync_confirm_frames(self):
+        # Auto check-in only counts fresh recognitions, so new faces are
+        # re-recognized every frame until the streak can reach min_frames
+        frames = self.auto_checkin.min_frames if self.auto_checkin_enabled else 1
+        self.engine.set_confirm_frames(frames)
+
     def reject_identity(self):
         self.current_detection = None
         self.ui.hide_confirm_buttons()
@@ -185,7 +371,9 @@ class FaceRecognitionApp:
         self.paused = False
 
     def export_attendance_csv(self):
-        if not self.attendance.records:
+        if not self.require_ready("Export Attendance"):
+            return
+        if self.attendance.count() == 0:
             messagebox.showinfo("Export Attendance", "No attendance recorded yet.")
             return
         save_path = filedialog.asksaveasfilename(
@@ -203,96 +391,133 @@ class FaceRecognitionApp:
             messagebox.showerror("Export Attendance", f"Failed to export CSV:\n{e}")
 
     def add_new_person(self):
+        if not self.require_ready("Add Person") or not self.require_not_retraining("Add Person"):
+            return
+        if self.enrollment is not None:
+            messagebox.showinfo("Add Person", f"Already enrolling {self.enrollment.name}.")
+            return
+        if not self.is_running:
+            messagebox.showerror("Error", "Camera not available!")
+            return
         name = simpledialog.askstring("Add Person", "Enter person's name:")
         if not name:
             return
         if name in self.db.known_faces:
             messagebox.showwarning("Warning", "Person already exists in database!")
             return
-        self.capture_face_samples(name)
-
-    def capture_face_samples(self, name: str):
-        if not self.cap or not self.cap.isOpened():
-            messagebox.showerror("Error", "Camera not available!")
-            return
+        self.start_enrollment(name)
 
-        samples_captured = 0
-        target_samples = 20
-        last_capture_time = 0.0
-        capture_delay = 0.5
+    def start_enrollment(self, name: str):
+        # Enrollment is a mode of the live pipeline: recognize_faces hands the
+        # previewed camera's tracked faces to the session, which keeps the
+        # sharp, varied ones; progress shows in the status and preview.
+        from enrollment import EnrollmentConfig, EnrollmentSession
 
-        messagebox.showinfo(
-            "Instructions",
-            f"Please look at the camera.\nWe'll capture {target_samples} samples.\n"
-            f"Move your head slightly for better recognition.\nPress 'q' to stop early.\n"
-            f"Samples will be captured every {capture_delay} seconds."
+        self.current_detection = None
+        # Run the cascade on every previewed frame while enrolling: the session
+        # only takes boxes detected on the frame it is looking at
+        tracker = self.preview_tracker()
+        self._enrollment_detect_interval = tracker.detect_interval
+        tracker.detect_interval = 1
+        self.enrollment = EnrollmentSession(
+            name,
+            EnrollmentConfig.from_dict(self.config.get("enrollment", {})),
+            size=self.db.template_config.template_size,
         )
+        self.ui.set_enrolling(True)
+        self.update_status(f"Enrolling {name}: {self.enrollment.progress}", force=True)
+        self.update_result("Look at the camera and turn your head slowly", force=True)
 
-        face_samples = []
-
-        while samples_captured < target_samples:
-            ret, frame = self.cap.read()
-            if not ret:
-                continue
-
-            frame = cv2.flip(frame, 1)
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            faces = self.face_cascade.detectMultiScale(gray, 1.3, 5)
-
-            current_time = time.time()
+    def preview_tracker(self):
+        return self.engine.tracker_for(self.source_tag({"source": self.sources[0].tag}))
 
-            for (x, y, w, h) in faces:
-                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                face_roi = gray[y:y + h, x:x + w]
-
-                if (w > 50 and h > 50 and current_time - last_capture_time >= capture_delay):
-                    face_samples.append(cv2.resize(face_roi, (100, 100)))
-                    samples_captured += 1
-                    last_capture_time = current_time
-                    cv2.rectangle(frame, (x - 5, y - 5), (x + w + 5, y + h + 5), (0, 255, 255), 3)
-
-                cv2.putText(frame, f"Samples: {samples_captured}/{target_samples}",
-                            (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-
-                time_until_next = capture_delay - (current_time - last_capture_time)
-                if time_until_next > 0 and samples_captured < target_samples:
-                    cv2.putText(frame, f"Next capture in: {time_until_next:.1f}s",
-                                (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
-
-            cv2.imshow("Capturing Face Samples", frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
-
-        cv2.destroyAllWindows()
+    def finish_enrollment(self):
+        # Tk thread: the session completed or Stop Enrollment was pressed
+        session = self.enrollment
+        if session is None:
+            return
+        self.enrollment = None
+        samples = session.finish()
+        self.preview_tracker().detect_interval = self._enrollment_detect_interval
+        self.ui.set_enrolling(False)
+        self.update_status("Looking for faces...", force=True)
+        self.update_result("No face detected", force=True)
 
-        if len(face_samples) < 5:
+        if len(samples) < session.config.min_samples:
             messagebox.showwarning("Warning", "Not enough samples captured. Please try again.")
             return
 
-        self.db.save_face_samples(name, face_samples)
-        messagebox.showinfo("Success", f"Successfully added {name} to database with {len(face_samples)} samples!")
+        # Writing the samples and the template store can take a while on a
+        # large database, so it runs on a worker thread like a retrain
+        self.update_status(f"Saving {session.name}...", force=True)
+        threading.Thread(
+            target=self._save_enrollment_worker, args=(session.name, samples), daemon=True
+        ).start()
+
+    def _save_enrollment_worker(self, name, samples):
+        try:
+            self.db.save_face_samples(name, samples)
+            self.main_window.after(0, lambda: self._enrollment_saved(name, len(samples)))
+        except Exception as e:
+            self.main_window.after(
+                0, lambda err=e: messagebox.showerror("Error", f"Failed to save {name}: {str(err)}")
+            )
+
+    def _enrollment_saved(self, name, count):
+        self.update_status("Looking for faces...", force=True)
+        messagebox.showinfo("Success", f"Successfully added {name} to database with {count} samples!")
 
     def retrain_model(self):
+        if not self.require_ready("Retrain Model"):
+            return
         if not self.db.known_faces:
             messagebox.showwarning("Warning", "No people in database to train on!")
             return
+        if self.retraining:
+            messagebox.showinfo("Retrain Model", "Retraining is already in progress.")
+            return
+        if self.enrollment is not None:
+            # finish_enrollment must never overlap a retrain
+            messagebox.showinfo("Retrain Model", f"Finish enrolling {self.enrollment.name} first.")
+            return
+        # Train on a worker thread; recognition keeps using the old templates
+        # until train_model swaps the new matcher in
+        self.retraining = True
+        self.update_status("Retraining model...", force=True)
+        threading.Thread(target=self._retrain_worker, daemon=True).start()
+
+    def _retrain_worker(self):
+        def progress(done, total, name):
+            self.main_window.after(
+                0, lambda: self.update_status(f"Retraining model... {done}/{total} ({name})", force=True)
+            )
+
         try:
-            self.update_status("Retraining model...")
             start_time = time.time()
-            self.db.train_model()
+            self.db.train_model(progress=progress)
             training_time = time.time() - start_time
-            self.update_status("Model retrained successfully!")
-            messagebox.showinfo(
-                "Success",
-                f"Model retrained with {len(self.db.face_templates)} people!\n"
-                f"Training completed in {training_time:.2f} seconds."
-            )
-            self.main_window.after(3000, lambda: self.update_status("Looking for faces..."))
+            self.main_window.after(0, lambda: self._retrain_finished(training_time))
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to retrain model: {str(e)}")
-            self.update_status("Looking for faces...")
+            self.main_window.after(0, lambda err=e: self._retrain_failed(err))
+
+    def _retrain_finished(self, training_time):
+        self.retraining = False
+        self.update_status("Model retrained successfully!", force=True)
+        messagebox.showinfo(
+            "Success",
+            f"Model retrained with {len(self.db.face_templates)} people!\n"
+            f"Training completed in {training_time:.2f} seconds."
+        )
+        self.main_window.after(3000, lambda: self.update_status("Looking for faces..."))
+
+    def _retrain_failed(self, error):
+        self.retraining = False
+        messagebox.showerror("Error", f"Failed to retrain model: {str(error)}")
+        self.update_status("Looking for faces...")
 
     def view_database(self):
+        if not self.require_ready("Database"):
+            return
         if not self.db.known_faces:
             messagebox.showinfo("Database", "Database is empty!")
             return
@@ -300,6 +525,8 @@ class FaceRecognitionApp:
         messagebox.showinfo("Database Contents", "People in database:\n" + "\n".join(names))
 
     def clear_database(self):
+        if not self.require_ready("Clear Database") or not self.require_not_retraining("Clear Database"):
+            return
         if messagebox.askyesno("Confirm", "Are you sure you want to clear the entire database?"):
             try:
                 self.db.clear()
@@ -312,7 +539,9 @@ class FaceRecognitionApp:
         try:
             self.recognition_threshold = int(value) / 100.0
         except Exception:
-            pass
+            return
+        if self.engine is not None:
+            self.engine.recognition_threshold = self.recognition_threshold
 
     def start(self):
         try:
@@ -322,9 +551,15 @@ class FaceRecognitionApp:
             print(f"Application error: {e}")
 
     def on_closing(self):
+        self.closing = True
         self.is_running = False
-        if self.cap:
-            self.cap.release()
-        cv2.destroyAllWindows()
+        self.enrollment = None
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        for source in self.sources:
+            source.stop()
+        self.metrics_exporter.stop()
+        if self.attendance is not None:
+            self.attendance.close()
         self.main_window.destroy()
 
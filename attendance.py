@@ -1,58 +1,144 @@
 import os
-import csv
 import time
-from typing import List, Dict, Optional
+from typing import Dict, Iterator, List, Optional
+
+from attendance_store import AttendanceStore, SqliteAttendanceStore, open_store, read_csv, write_csv
+from attendance_writer import AsyncAttendanceWriter
 
 
 class AttendanceManager:
-    # Manage attendance records
+    # Manage attendance records on top of a pluggable store (SQLite by default).
+    # Nothing is loaded at startup; history is read through query().
 
-    def __init__(self, log_path: str = "attendance_log.csv") -> None:
+    def __init__(
+        self,
+        log_path: str = "attendance.db",
+        store: Optional[AttendanceStore] = None,
+        legacy_csv_path: Optional[str] = "attendance_log.csv",
+        session: Optional[str] = None,
+        async_writes: bool = False,
+        writer_options: Optional[Dict] = None,
+    ) -> None:
         self.log_path = log_path
-        self.records: List[Dict[str, str]] = []
-        self.load_records()
+        self.store = store if store is not None else open_store(log_path)
+        # Tag for records logged without an explicit session (e.g. a lecture ID)
+        self.session = session
+        self._import_legacy_csv(legacy_csv_path)
+
+        # With async_writes, log() only journals and queues the record; a
+        # background writer group-commits to the store (see AsyncAttendanceWriter)
+        self.writer: Optional[AsyncAttendanceWriter] = None
+        if async_writes:
+            options = {"journal_path": f"{log_path}.journal", **(writer_options or {})}
+            self.writer = AsyncAttendanceWriter(self.store, **options)
 
-    def load_records(self) -> None:
-        # Load attendance records from CSV if it exists
-        if not os.path.exists(self.log_path):
+    def _import_legacy_csv(self, legacy_csv_path: Optional[str]) -> None:
+        # One-time import of the old attendance_log.csv into a new SQLite store
+        if not isinstance(self.store, SqliteAttendanceStore) or not legacy_csv_path:
+            return
+        if not os.path.exists(legacy_csv_path) or self.store.get_meta("legacy_csv_imported"):
             return
         try:
-            with open(self.log_path, mode='r', newline='', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if "name" in row and "timestamp" in row:
-                        self.records.append({
-                            "name": row["name"],
-                            "timestamp": row["timestamp"],
-                        })
+            imported = self.import_csv(legacy_csv_path)
+            self.store.set_meta("legacy_csv_imported", legacy_csv_path)
+            if imported:
+                print(f"Imported {imported} attendance records from {legacy_csv_path}")
         except Exception as e:
-            print(f"Failed to load attendance CSV: {e}")
-
-    def log(self, name: str, timestamp: Optional[str] = None) -> Dict[str, str]:
-        # Append an attendance record, Returns the record
-        if timestamp is None:
-            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+            print(f"Failed to import attendance CSV: {e}")
 
-        record = {"name": name, "timestamp": timestamp}
-        self.records.append(record)
+    @property
+    def records(self) -> List[Dict[str, str]]:
+        # Full history as a list. Prefer query() or count(), which don't load everything.
+        return list(self.store.query())
 
-        # Append to CSV (create with header if missing)
-        file_exists = os.path.exists(self.log_path)
+    def log(
+        self,
+        name: str,
+        timestamp: Optional[str] = None,
+        session: Optional[str] = None,
+        source: Optional[str] = None,
+    ) -> Dict[str, str]:
+        # Append an attendance record, Returns the record. source tags the
+        # camera that saw the person when several share one manager.
+        record = self._make_record(name, timestamp, session, source)
         try:
-            with open(self.log_path, mode='a', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=["name", "timestamp"])
-                if not file_exists:
-                    writer.writeheader()
-                writer.writerow(record)
+            if self.writer is not None:
+                self.writer.submit(record)
+            else:
+                self.store.add(record)
         except Exception as e:
-            print(f"Failed to write attendance CSV: {e}")
-
+            print(f"Failed to write attendance record: {e}")
         return record
 
-    def export(self, save_path: str) -> None:
-        # Export current in memory records to a given CSV path
-        with open(save_path, mode='w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=["name", "timestamp"])
-            writer.writeheader()
-            writer.writerows(self.records)
+    def log_many(self, records: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        # Batched write: one transaction for all records
+        batch = [self._make_record(r["name"], r.get("timestamp"), r.get("session"), r.get("source")) for r in records]
+        if self.writer is not None:
+            for record in batch:
+                self.writer.submit(record)
+        else:
+            self.store.add_many(batch)
+        return batch
+
+    def flush(self) -> None:
+        # Make every logged record visible in the store
+        if self.writer is not None:
+            self.writer.flush()
+
+    def query(
+        self,
+        name: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        session: Optional[str] = None,
+        limit: Optional[int] = None,
+        source: Optional[str] = None,
+    ) -> Iterator[Dict[str, str]]:
+        # start/end are inclusive; a bare date like "2025-09-01" works for either
+        if end is not None and len(end) == 10:
+            end += " 23:59:59"
+        self.flush()
+        return self.store.query(name=name, start=start, end=end, session=session, limit=limit, source=source)
 
+    def attended_on(self, date: str, session: Optional[str] = None) -> List[str]:
+        # Distinct names with a record on date ("YYYY-mm-dd")
+        return sorted({rec["name"] for rec in self.query(start=date, end=date, session=session)})
+
+    def count(self) -> int:
+        self.flush()
+        return self.store.count()
+
+    def last_seen(self) -> Dict[str, str]:
+        self.flush()
+        return self.store.last_seen()
+
+    def import_csv(self, path: str) -> int:
+        # Bulk-load a CSV export (name, timestamp[, session]) in one batch
+        records = list(read_csv(path))
+        if records:
+            self.store.add_many(records)
+        return len(records)
+
+    def export(self, save_path: str, **filters) -> int:
+        # Export records (optionally filtered like query()) to a CSV file
+        return write_csv(self.query(**filters), save_path)
+
+    def close(self) -> None:
+        # Drains the async writer first, so on_closing never loses queued records
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        self.store.close()
+
+    def _make_record(
+        self, name: str, timestamp: Optional[str], session: Optional[str], source: Optional[str] = None
+    ) -> Dict[str, str]:
+        if timestamp is None:
+            timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        record = {"name": name, "timestamp": timestamp}
+        session = session if session is not None else self.session
+        if session is not None:
+            record["session"] = session
+        if source is not None:
+            record["source"] = source
+        return record
@@ -0,0 +1,249 @@
+import csv
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+FIELDS = ["name", "timestamp", "session", "source"]
+
+
+class AttendanceStore:
+    # Storage backend interface for AttendanceManager. Records are dicts with
+    # "name", "timestamp" ("YYYY-mm-dd HH:MM:SS"), an optional "session" and
+    # an optional "source" (the camera tag that saw the person).
+
+    def add_many(self, records: List[Dict[str, str]]) -> None:
+        raise NotImplementedError
+
+    def add(self, record: Dict[str, str]) -> None:
+        self.add_many([record])
+
+    def query(
+        self,
+        name: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        session: Optional[str] = None,
+        limit: Optional[int] = None,
+        source: Optional[str] = None,
+    ) -> Iterator[Dict[str, str]]:
+        # Records in timestamp order; start/end are inclusive timestamp bounds
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def last_seen(self) -> Dict[str, str]:
+        # Latest timestamp per name
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class CsvAttendanceStore(AttendanceStore):
+    # The original format: whole history held in memory, appended row by row.
+    # Files from before sessions and sources only have name,timestamp; the
+    # first write rewrites them once with the full FIELDS header.
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.records: List[Dict[str, str]] = []
+        self._fieldnames: Optional[List[str]] = None
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, mode='r', newline='', encoding='utf-8') as f:
+                reader = csv.DictReader(f)
+                for row in reader:
+                    if "name" in row and "timestamp" in row:
+                        self.records.append(_clean(row))
+                self._fieldnames = list(reader.fieldnames or [])
+        except Exception as e:
+            print(f"Failed to load attendance CSV: {e}")
+
+    def add_many(self, records: List[Dict[str, str]]) -> None:
+        self.records.extend(records)
+        try:
+            if os.path.exists(self.path) and self._fieldnames is not None and self._fieldnames != FIELDS:
+                # Old header: rewrite everything (atomically) with every column.
+                # Never done when the file failed to load, so nothing is lost.
+                tmp_path = f"{self.path}.tmp"
+                write_csv(self.records, tmp_path)
+                os.replace(tmp_path, self.path)
+            else:
+                file_exists = os.path.exists(self.path)
+                with open(self.path, mode='a', newline='', encoding='utf-8') as f:
+                    writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+                    if not file_exists:
+                        writer.writeheader()
+                    writer.writerows(records)
+            self._fieldnames = FIELDS
+        except Exception as e:
+            print(f"Failed to write attendance CSV: {e}")
+
+    def query(self, name=None, start=None, end=None, session=None, limit=None, source=None) -> Iterator[Dict[str, str]]:
+        matched = 0
+        for rec in sorted(self.records, key=lambda r: r["timestamp"]):
+            if name is not None and rec["name"] != name:
+                continue
+            if start is not None and rec["timestamp"] < start:
+                continue
+            if end is not None and rec["timestamp"] > end:
+                continue
+            if session is not None and rec.get("session") != session:
+                continue
+            if source is not None and rec.get("source") != source:
+                continue
+            yield rec
+            matched += 1
+            if limit is not None and matched >= limit:
+                return
+
+    def count(self) -> int:
+        return len(self.records)
+
+    def last_seen(self) -> Dict[str, str]:
+        latest: Dict[str, str] = {}
+        for rec in self.records:
+            if rec["timestamp"] > latest.get(rec["name"], ""):
+                latest[rec["name"]] = rec["timestamp"]
+        return latest
+
+
+class SqliteAttendanceStore(AttendanceStore):
+    # Embedded SQLite store indexed by name and timestamp; nothing is loaded
+    # at startup and every query is answered from the indexes
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS attendance ("
+                " id INTEGER PRIMARY KEY,"
+                " name TEXT NOT NULL,"
+                " timestamp TEXT NOT NULL,"
+                " session TEXT,"
+                " source TEXT)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(attendance)")}
+            if "source" not in columns:
+                # Databases created before multi-camera support
+                self._conn.execute("ALTER TABLE attendance ADD COLUMN source TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_name_ts ON attendance(name, timestamp)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_ts ON attendance(timestamp)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_session_ts ON attendance(session, timestamp)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def add_many(self, records: List[Dict[str, str]]) -> None:
+        # One transaction per batch
+        rows = [(r["name"], r["timestamp"], r.get("session"), r.get("source")) for r in records]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO attendance (name, timestamp, session, source) VALUES (?, ?, ?, ?)", rows
+            )
+
+    def query(self, name=None, start=None, end=None, session=None, limit=None, source=None) -> Iterator[Dict[str, str]]:
+        clauses, params = [], []
+        if name is not None:
+            clauses.append("name = ?")
+            params.append(name)
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("timestamp <= ?")
+            params.append(end)
+        if session is not None:
+            clauses.append("session = ?")
+            params.append(session)
+        if source is not None:
+            clauses.append("source = ?")
+            params.append(source)
+        sql = "SELECT name, timestamp, session, source FROM attendance"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY timestamp, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        # Fetch in chunks so exporting the full history never holds it all in memory
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(1000)
+            if not rows:
+                return
+            for row_name, row_ts, row_session, row_source in rows:
+                rec = {"name": row_name, "timestamp": row_ts}
+                if row_session is not None:
+                    rec["session"] = row_session
+                if row_source is not None:
+                    rec["source"] = row_source
+                yield rec
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
+
+    def last_seen(self) -> Dict[str, str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT name, MAX(timestamp) FROM attendance GROUP BY name").fetchall()
+        return dict(rows)
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _clean(row: Dict[str, str]) -> Dict[str, str]:
+    rec = {"name": row["name"], "timestamp": row["timestamp"]}
+    if row.get("session"):
+        rec["session"] = row["session"]
+    if row.get("source"):
+        rec["source"] = row["source"]
+    return rec
+
+
+def read_csv(path: str) -> Iterator[Dict[str, str]]:
+    with open(path, mode='r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if row.get("name") and row.get("timestamp"):
+                yield _clean(row)
+
+
+def write_csv(records: Iterable[Dict[str, str]], path: str) -> int:
+    # Streams records to CSV; returns how many were written
+    written = 0
+    with open(path, mode='w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for rec in records:
+            writer.writerow(rec)
+            written += 1
+    return written
+
+
+def open_store(path: str) -> AttendanceStore:
+    # .csv paths keep the legacy CSV backend; anything else is SQLite
+    if path.lower().endswith(".csv"):
+        return CsvAttendanceStore(path)
+    return SqliteAttendanceStore(path)
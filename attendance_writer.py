@@ -0,0 +1,157 @@
+import json
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+from attendance_store import AttendanceStore
+
+
+FSYNC_POLICIES = ("always", "batch", "never")
+
+
+class AsyncAttendanceWriter:
+    # Group-committed attendance writes on a background thread.
+    #
+    # submit() appends the record to a local journal file (one write() into
+    # the already-open file, so it survives a process crash) and queues it.
+    # The writer thread commits queued records to the store in batches of up
+    # to batch_size or every flush_interval seconds, then appends a commit
+    # marker. On startup any journal entries after the last marker are
+    # replayed into the store, and the journal is truncated whenever
+    # everything has been committed.
+    #
+    # fsync policy for the journal: "always" = every record, "batch" = once
+    # per commit cycle, "never" = leave it to the OS.
+
+    def __init__(
+        self,
+        store: AttendanceStore,
+        journal_path: str = "attendance.journal",
+        max_queue: int = 10000,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        fsync: str = "batch",
+    ) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.store = store
+        self.journal_path = journal_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+
+        self._queue: "queue.Queue[tuple]" = queue.Queue(maxsize=max_queue)
+        self._journal_lock = threading.Lock()
+        self._seq = 0
+        self._committed = 0
+        self._committed_cond = threading.Condition()
+        self._running = True
+
+        self.recovered = self._recover()
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: Dict[str, str]) -> None:
+        with self._journal_lock:
+            self._seq += 1
+            seq = self._seq
+            self._journal.write(json.dumps({"s": seq, "r": record}) + "\n")
+            self._journal.flush()
+            if self.fsync == "always":
+                os.fsync(self._journal.fileno())
+        # A full queue blocks the caller (backpressure) rather than dropping attendance
+        self._queue.put((seq, record))
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        # Block until everything submitted so far is in the store
+        target = self._seq
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._committed_cond:
+            while self._committed < target:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._committed_cond.wait(remaining)
+        return True
+
+    def pending(self) -> int:
+        return self._seq - self._committed
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        self.flush(timeout)
+        self._running = False
+        self._thread.join(timeout)
+        with self._journal_lock:
+            if self._committed >= self._seq:
+                self._journal.truncate(0)
+            self._journal.close()
+
+    def _run(self) -> None:
+        retry: List[tuple] = []
+        while self._running or retry or not self._queue.empty():
+            batch: List[tuple] = retry
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=min(remaining, 0.1)))
+                except queue.Empty:
+                    if not self._running:
+                        break
+            retry = []
+            if batch and not self._commit(batch):
+                if not self._running:
+                    return  # still journaled; replayed on the next start
+                retry = batch
+                time.sleep(self.flush_interval)
+
+    def _commit(self, batch: List[tuple]) -> bool:
+        if self.fsync == "batch":
+            with self._journal_lock:
+                os.fsync(self._journal.fileno())
+        try:
+            self.store.add_many([record for _, record in batch])
+        except Exception as e:
+            print(f"Failed to write attendance batch: {e}")
+            return False
+
+        last = max(seq for seq, _ in batch)
+        with self._journal_lock:
+            self._journal.write(json.dumps({"c": last}) + "\n")
+            self._journal.flush()
+            if self._queue.empty() and last >= self._seq:
+                # Everything is committed; start the journal over
+                self._journal.truncate(0)
+                self._journal.seek(0)
+        with self._committed_cond:
+            self._committed = max(self._committed, last)
+            self._committed_cond.notify_all()
+        return True
+
+    def _recover(self) -> int:
+        # Replay journal entries that never got a commit marker
+        if not os.path.exists(self.journal_path):
+            return 0
+        entries: Dict[int, Dict[str, str]] = {}
+        committed = 0
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    continue  # torn final line from a crash mid-write
+                if "c" in item:
+                    committed = max(committed, item["c"])
+                elif "s" in item:
+                    entries[item["s"]] = item["r"]
+        tail = [entries[s] for s in sorted(entries) if s > committed]
+        if tail:
+            self.store.add_many(tail)
+            print(f"Recovered {len(tail)} unflushed attendance records")
+        open(self.journal_path, "w").close()
+        return len(tail)
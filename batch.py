@@ -0,0 +1,284 @@
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+
+from config import load_config
+from detection import DetectorConfig
+from engine import IMAGE_EXTENSIONS, RecognitionEngine
+from face_db import FaceDatabase
+from matcher import TemplateConfig
+from tracker import FaceTracker
+
+
+# Offline recognition over recorded video files and image folders.
+#
+#   python batch.py footage/*.mp4 snapshots/ --stride 2 --workers 4 \
+#       --output detections.jsonl --attendance attendance_backfill.csv
+
+DETECTION_FIELDS = ["source", "file", "frame", "time_s", "track_id", "x", "y", "w", "h", "name", "score", "recognized", "fresh"]
+
+# Per-worker engine, built once by _init_worker
+_engine: Optional[RecognitionEngine] = None
+_options: Dict = {}
+
+
+def _init_worker(options: Dict) -> None:
+    global _engine, _options
+    _options = options
+    config = load_config(options["config"])
+    db = FaceDatabase(
+        faces_db_path=options["faces_db"],
+        store_path=options["store"],
+        template_config=TemplateConfig.from_dict(config.get("templates", {})),
+    )
+    db.load()
+    detector_config = DetectorConfig.from_dict(config.get("detection", {}))
+    _engine = RecognitionEngine(db=db, recognition_threshold=options["threshold"], detector_config=detector_config)
+
+
+def plan_tasks(inputs: List[str], chunk_size: int) -> List[Dict]:
+    # Split every input into independent chunks of frames (videos) or files (folders)
+    tasks: List[Dict] = []
+    for path in inputs:
+        if os.path.isdir(path):
+            files = sorted(
+                os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            for start in range(0, len(files), chunk_size):
+                tasks.append({"kind": "images", "source": path, "start": start, "files": files[start:start + chunk_size]})
+            continue
+
+        cap = cv2.VideoCapture(path)
+        if not cap.isOpened():
+            print(f"Skipping {path}: could not open")
+            continue
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        cap.release()
+        if total <= 0:
+            # Unknown length (stream or odd container): one sequential chunk
+            tasks.append({"kind": "video", "source": path, "start": 0, "end": None, "fps": fps})
+            continue
+        for start in range(0, total, chunk_size):
+            tasks.append({"kind": "video", "source": path, "start": start, "end": min(start + chunk_size, total), "fps": fps})
+    return tasks
+
+
+def _detections_for(result, source: str, file: str, frame_no: int, time_s: float, chunk: int) -> List[Dict]:
+    # source groups rows for attendance (the video, or the whole image folder);
+    # file is the video or the individual image the face was found in
+    rows = []
+    for det in result.detections:
+        x, y, w, h = det.box
+        rows.append({
+            "source": source,
+            "file": file,
+            "frame": frame_no,
+            "time_s": round(time_s, 3),
+            "track_id": f"{chunk}-{det.track_id}",
+            "x": x, "y": y, "w": w, "h": h,
+            "name": det.name or "",
+            "score": round(det.score, 4),
+            "recognized": det.recognized,
+            "fresh": det.fresh,
+        })
+    return rows
+
+
+def process_chunk(task: Dict) -> Tuple[Dict, List[Dict], int, float]:
+    # Runs in a worker process; returns (task, detection rows, frames processed, seconds)
+    engine = _engine
+    stride = _options["stride"]
+    flip = _options["flip"]
+    started = time.perf_counter()
+    rows: List[Dict] = []
+    frames = 0
+
+    if task["kind"] == "images":
+        # Unrelated stills: detect and recognize every image from scratch
+        engine.tracker = FaceTracker(detect_interval=1, recognize_interval=1)
+        for offset, path in enumerate(task["files"][::stride]):
+            img = cv2.imread(path)
+            if img is None:
+                continue
+            engine.tracker.reset()
+            if flip:
+                img = cv2.flip(img, 1)
+            result = engine.process_frame(img)
+            frame_no = task["start"] + offset * stride
+            rows.extend(_detections_for(result, task["source"], path, frame_no, 0.0, task["start"]))
+            frames += 1
+        return task, rows, frames, time.perf_counter() - started
+
+    # New identities are re-recognized on every frame until min_hits agree,
+    # so derive_attendance has that many fresh recognitions to count
+    engine.tracker = FaceTracker(detect_interval=_options["detect_interval"], confirm_frames=_options["min_hits"])
+    cap = cv2.VideoCapture(task["source"])
+    if task["start"]:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, task["start"])
+    frame_no = task["start"]
+    try:
+        while task["end"] is None or frame_no < task["end"]:
+            # grab() skips strided frames without decoding them
+            if not cap.grab():
+                break
+            if (frame_no - task["start"]) % stride == 0:
+                ok, frame = cap.retrieve()
+                if ok:
+                    if flip:
+                        frame = cv2.flip(frame, 1)
+                    result = engine.process_frame(frame)
+                    rows.extend(_detections_for(
+                        result, task["source"], task["source"], frame_no, frame_no / task["fps"], task["start"]
+                    ))
+                    frames += 1
+            frame_no += 1
+    finally:
+        cap.release()
+    return task, rows, frames, time.perf_counter() - started
+
+
+def derive_attendance(rows: List[Dict], min_hits: int, start_time: Optional[float]) -> List[Dict]:
+    # First time each person is recognized on min_hits frames of a source.
+    # Only fresh rows count: frames that reuse a track's cached identity would
+    # turn one false positive into min_hits hits.
+    hits: Dict[Tuple[str, str], int] = {}
+    first: Dict[Tuple[str, str], Dict] = {}
+    for row in sorted(rows, key=lambda r: (r["source"], r["frame"])):
+        if not row["recognized"] or not row.get("fresh", True):
+            continue
+        key = (row["source"], row["name"])
+        hits[key] = hits.get(key, 0) + 1
+        if hits[key] == min_hits and key not in first:
+            first[key] = row
+
+    records = []
+    for (source, name), row in sorted(first.items(), key=lambda kv: (kv[1]["source"], kv[1]["frame"])):
+        if start_time is not None:
+            timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(start_time + row["time_s"]))
+        else:
+            timestamp = f"+{row['time_s']:.1f}s"
+        records.append({"name": name, "timestamp": timestamp, "source": source})
+    return records
+
+
+class _RowWriter:
+    # Streams detection rows to .csv or .jsonl as chunks complete
+
+    def __init__(self, path: str) -> None:
+        self.jsonl = path.lower().endswith(".jsonl")
+        self.f = open(path, "w", newline="", encoding="utf-8")
+        self.writer = None
+        if not self.jsonl:
+            self.writer = csv.DictWriter(self.f, fieldnames=DETECTION_FIELDS)
+            self.writer.writeheader()
+
+    def write(self, rows: List[Dict]) -> None:
+        if self.jsonl:
+            for row in rows:
+                self.f.write(json.dumps(row) + "\n")
+        else:
+            self.writer.writerows(rows)
+
+    def close(self) -> None:
+        self.f.close()
+
+
+def run(args: argparse.Namespace) -> Dict:
+    options = {
+        "faces_db": args.faces_db,
+        "store": args.store,
+        "threshold": args.threshold,
+        "stride": max(1, args.stride),
+        "flip": not args.no_flip,
+        "detect_interval": args.detect_interval,
+        "min_hits": max(1, args.min_hits),
+        "config": args.config,
+    }
+    tasks = plan_tasks(args.inputs, args.chunk_size)
+    if not tasks:
+        print("Nothing to process.")
+        return {}
+
+    writer = _RowWriter(args.output) if args.output else None
+    all_rows: List[Dict] = []
+    total_frames = 0
+    started = time.perf_counter()
+    workers = max(1, min(args.workers or os.cpu_count() or 1, len(tasks)))
+
+    try:
+        if workers == 1:
+            _init_worker(options)
+            results = (process_chunk(t) for t in tasks)
+            for task, rows, frames, seconds in results:
+                total_frames += frames
+                all_rows.extend(rows)
+                if writer:
+                    writer.write(rows)
+                print(f"{task['source']} @{task['start']}: {frames} frames in {seconds:.2f}s")
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(options,)) as pool:
+                futures = [pool.submit(process_chunk, t) for t in tasks]
+                for future in as_completed(futures):
+                    task, rows, frames, seconds = future.result()
+                    total_frames += frames
+                    all_rows.extend(rows)
+                    if writer:
+                        writer.write(rows)
+                    print(f"{task['source']} @{task['start']}: {frames} frames in {seconds:.2f}s")
+    finally:
+        if writer:
+            writer.close()
+
+    elapsed = time.perf_counter() - started
+    start_time = time.mktime(time.strptime(args.start_time, "%Y-%m-%d %H:%M:%S")) if args.start_time else None
+    records = derive_attendance(all_rows, args.min_hits, start_time)
+    if args.attendance:
+        with open(args.attendance, "w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=["name", "timestamp", "source"])
+            w.writeheader()
+            w.writerows(records)
+
+    summary = {
+        "chunks": len(tasks),
+        "workers": workers,
+        "frames": total_frames,
+        "faces": len(all_rows),
+        "attendance_records": len(records),
+        "seconds": round(elapsed, 3),
+        "fps": round(total_frames / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+    print(
+        f"Processed {total_frames} frames ({len(all_rows)} faces) in {elapsed:.2f}s "
+        f"with {workers} workers: {summary['fps']} frames/s"
+    )
+    return summary
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="FaceAttend offline batch recognition")
+    parser.add_argument("inputs", nargs="+", help="video files and/or directories of images")
+    parser.add_argument("--output", help="per-frame detections, .csv or .jsonl")
+    parser.add_argument("--attendance", help="derived attendance CSV (name, timestamp, source)")
+    parser.add_argument("--stride", type=int, default=1, help="process every Nth frame/image")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=500, help="frames or images per work unit")
+    parser.add_argument("--detect-interval", type=int, default=5, help="video frames between cascade runs")
+    parser.add_argument("--threshold", type=float, default=0.6, help="recognition threshold, 0-1")
+    parser.add_argument("--min-hits", type=int, default=3, help="fresh recognitions needed for attendance")
+    parser.add_argument("--start-time", help="recording start 'YYYY-mm-dd HH:MM:SS' for absolute timestamps")
+    parser.add_argument("--no-flip", action="store_true", help="don't mirror frames like the live camera does")
+    parser.add_argument("--config", help="settings JSON (default: $FACEATTEND_CONFIG or faceattend.json)")
+    parser.add_argument("--faces-db", default="faces_db")
+    parser.add_argument("--store", default="face_templates.bin")
+    return parser
+
+
+if __name__ == "__main__":
+    run(build_parser().parse_args())
@@ -0,0 +1,347 @@
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import cv2
+import numpy as np
+
+from attendance import AttendanceManager
+from detection import DetectorConfig, FaceDetector
+from engine import CASCADE_FILE
+from face_db import FaceDatabase
+from matcher import TemplateConfig, TemplateMatcher, quantize
+from sample_cache import CACHE_FILE
+import synthetic
+
+
+# Reproducible benchmarks for the FaceAttend hot paths.
+#
+#   python benchmark.py --output bench.json
+#   python benchmark.py --quick --compare bench.json   # exit 1 on regressions
+#
+# Every result key is stable across runs ("group/params"), so two JSON files
+# can be compared entry by entry.
+
+PROTOTYPES = 5  # templates per person in the multi-template match benchmark
+
+# (label, TemplateConfig overrides) compared by the compact-representation benchmark
+COMPACT_VARIANTS = [
+    ("baseline", {}),
+    ("size64-float16", {"size": 64, "dtype": "float16"}),
+    ("size48-uint8", {"size": 48, "dtype": "uint8"}),
+    ("size48-uint8-pca128", {"size": 48, "dtype": "uint8", "pca_components": 128}),
+    ("size32-uint8-pca64", {"size": 32, "dtype": "uint8", "pca_components": 64}),
+]
+
+
+def timeit(fn: Callable[[], object], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    runs: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    return {
+        "median_s": statistics.median(runs),
+        "min_s": min(runs),
+        "mean_s": statistics.fmean(runs),
+        "runs": repeat,
+    }
+
+
+@contextlib.contextmanager
+def quiet():
+    # The code under test prints progress; keep it out of the timings and output
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def bench_detect(sizes: List[str], faces: int, repeat: int, seed: int) -> Dict[str, Dict]:
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + CASCADE_FILE)
+    results = {}
+    for size in sizes:
+        width, height = (int(v) for v in size.split("x"))
+        frame, _ = synthetic.make_frame(width, height, faces, seed=seed)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        results[f"detect/{size}"] = timeit(lambda: cascade.detectMultiScale(gray, 1.3, 5), repeat)
+        downscaled = FaceDetector(cascade, DetectorConfig(detect_width=640, min_face=60))
+        results[f"detect/downscaled640/{size}"] = timeit(lambda: downscaled.detect(gray), repeat)
+    return results
+
+
+def bench_match(template_counts: List[int], faces: int, repeat: int, seed: int) -> Dict[str, Dict]:
+    rng = np.random.default_rng(seed)
+    results = {}
+    for n in template_counts:
+        identities = synthetic.make_identities(n, seed)
+        templates = {name: np.float32(synthetic.render_face(p)) for name, p in identities.items()}
+        names = list(identities.keys())
+        rois = [
+            cv2.resize(synthetic.render_face(identities[names[k % n]], rng), (130, 130))
+            for k in range(faces)
+        ]
+
+        def loop_scan():
+            # The original per-template cv2.matchTemplate scan from process_faces
+            for roi in rois:
+                face_float = np.float32(cv2.resize(roi, (100, 100)))
+                for template in templates.values():
+                    float(np.max(cv2.matchTemplate(face_float, template, cv2.TM_CCOEFF_NORMED)))
+
+        matcher = TemplateMatcher(templates)
+        results[f"match/loop/N={n},K={faces}"] = timeit(loop_scan, repeat)
+        results[f"match/batch/N={n},K={faces}"] = timeit(lambda: matcher.match_batch(rois), repeat)
+        results[f"match/build/N={n}"] = timeit(lambda: TemplateMatcher(templates), repeat)
+
+        # Several prototypes per person: exhaustive scan vs the IVF index
+        prototypes = {
+            name: np.stack([np.float32(synthetic.render_face(p, rng)) for _ in range(PROTOTYPES)])
+            for name, p in identities.items()
+        }
+        exhaustive = TemplateMatcher(templates, prototypes, TemplateConfig(mode="all", index_min_rows=10 ** 9))
+        indexed = TemplateMatcher(templates, prototypes, TemplateConfig(mode="all", index_min_rows=0))
+        rows = n * PROTOTYPES
+        results[f"match/multi/exhaustive/rows={rows}"] = timeit(lambda: exhaustive.match(rois[0]), repeat)
+        results[f"match/multi/ivf/rows={rows}"] = timeit(lambda: indexed.match(rois[0]), repeat)
+
+        # Alignment-tolerant rescoring of one face placed in a frame
+        frame = np.full((300, 300), 128, dtype=np.uint8)
+        frame[80:210, 80:210] = rois[0]
+        aligned = TemplateMatcher(templates, config=TemplateConfig(align_radius=0.1))
+        results[f"match/aligned/N={n}"] = timeit(lambda: aligned.match_boxes(frame, [(90, 85, 130, 130)]), repeat)
+    return results
+
+
+def bench_compact(people: int, samples: int, probes: int, repeat: int, seed: int) -> Dict[str, Dict]:
+    # Accuracy, template size and match time of each compact representation,
+    # all trained on the same synthetic samples and scored on the same probes
+    rng = np.random.default_rng(seed)
+    identities = synthetic.make_identities(people, seed)
+    names = list(identities.keys())
+    training = {name: [synthetic.render_face(p, rng) for _ in range(samples)] for name, p in identities.items()}
+    probe_set = [
+        (names[k % people], cv2.resize(synthetic.render_face(identities[names[k % people]], rng), (130, 130)))
+        for k in range(probes)
+    ]
+
+    results = {}
+    for label, overrides in COMPACT_VARIANTS:
+        config = TemplateConfig(**overrides)
+        size = config.template_size
+        templates = {
+            name: quantize(np.mean([cv2.resize(np.float32(face), size) for face in faces], axis=0), config.dtype)
+            for name, faces in training.items()
+        }
+        matcher = TemplateMatcher(templates, config=config)
+        correct = sum(matcher.match(roi)[0][0] == name for name, roi in probe_set)
+        stats = timeit(lambda: matcher.match_batch([roi for _, roi in probe_set[:10]]), repeat)
+        stats["accuracy"] = correct / len(probe_set)
+        stats["bytes_per_template"] = int(np.dtype(config.dtype).itemsize * size[0] * size[1])
+        stats["dims"] = int(matcher.matrix.shape[1])
+        results[f"compact/{label}/N={people}"] = stats
+    return results
+
+
+def bench_database(people: int, samples: int, repeat: int, seed: int, workdir: str) -> Dict[str, Dict]:
+    faces_db_path = os.path.join(workdir, "faces_db")
+    known_faces, _ = synthetic.build_faces_db(faces_db_path, people, samples, seed)
+    store_path = os.path.join(workdir, "face_templates.bin")
+    results = {}
+
+    def make_db(sample_cache=False):
+        db = FaceDatabase(faces_db_path=faces_db_path, store_path=store_path,
+                          legacy_templates_path=os.path.join(workdir, "none.pkl"),
+                          legacy_names_path=os.path.join(workdir, "none_names.pkl"),
+                          sample_cache=sample_cache)
+        db.known_faces = dict(known_faces)
+        return db
+
+    tag = f"P={people},S={samples}"
+    with quiet():
+        results[f"train/serial/{tag}"] = timeit(lambda: make_db().train_model(workers=1), repeat)
+        workers = os.cpu_count() or 1
+        if workers > 1:
+            results[f"train/parallel/{tag}"] = timeit(lambda: make_db().train_model(workers=workers), repeat)
+            results[f"train/parallel/{tag}"]["workers"] = workers
+
+        # Sample cache: a cold retrain builds the sidecars, a warm one only stats the files
+        def drop_caches():
+            for name in known_faces:
+                cache_path = os.path.join(faces_db_path, name, CACHE_FILE)
+                if os.path.exists(cache_path):
+                    os.remove(cache_path)
+
+        def cold():
+            drop_caches()
+            make_db(sample_cache=True).train_model(workers=1)
+
+        results[f"train/cache-cold/{tag}"] = timeit(cold, repeat)
+        results[f"train/cache-warm/{tag}"] = timeit(lambda: make_db(sample_cache=True).train_model(workers=1), repeat)
+        drop_caches()
+
+        def load():
+            db = make_db()
+            db.load()
+            return db
+
+        results[f"load/{tag}"] = timeit(load, repeat)
+    return results
+
+
+def bench_attendance(record_counts: List[int], log_calls: int, repeat: int, workdir: str) -> Dict[str, Dict]:
+    results = {}
+    for n in record_counts:
+        rows = [
+            {"name": f"person_{i % 500:04d}", "timestamp": f"2025-09-{1 + i % 28:02d} 09:{i % 60:02d}:{i % 60:02d}"}
+            for i in range(n)
+        ]
+        csv_path = os.path.join(workdir, f"attendance_{n}.csv")
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["name", "timestamp"])
+            writer.writeheader()
+            writer.writerows(rows)
+        db_path = os.path.join(workdir, f"attendance_{n}.db")
+        AttendanceManager(log_path=db_path, legacy_csv_path=None).log_many(rows)
+
+        def log_batch(manager):
+            for i in range(log_calls):
+                manager.log(f"person_{i % 500:04d}")
+
+        with quiet():
+            # Legacy CSV backend: the whole file is parsed at startup
+            results[f"attendance/load_records/R={n}"] = timeit(
+                lambda: AttendanceManager(log_path=csv_path, legacy_csv_path=None), repeat
+            )
+            csv_manager = AttendanceManager(log_path=csv_path, legacy_csv_path=None)
+            stats = timeit(lambda: log_batch(csv_manager), repeat)
+            stats["per_call_s"] = stats["median_s"] / log_calls
+            results[f"attendance/log/R={n},calls={log_calls}"] = stats
+
+            # SQLite backend: open cost, per-call logging and indexed queries
+            results[f"attendance/sqlite/open/R={n}"] = timeit(
+                lambda: AttendanceManager(log_path=db_path, legacy_csv_path=None).close(), repeat
+            )
+            db_manager = AttendanceManager(log_path=db_path, legacy_csv_path=None)
+            stats = timeit(lambda: log_batch(db_manager), repeat)
+            stats["per_call_s"] = stats["median_s"] / log_calls
+            results[f"attendance/sqlite/log/R={n},calls={log_calls}"] = stats
+            results[f"attendance/sqlite/query_person/R={n}"] = timeit(
+                lambda: list(db_manager.query(name="person_0042")), repeat
+            )
+            results[f"attendance/sqlite/attended_on/R={n}"] = timeit(
+                lambda: db_manager.attended_on("2025-09-15"), repeat
+            )
+            db_manager.close()
+    return results
+
+
+def environment(args: argparse.Namespace) -> Dict:
+    return {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "args": vars(args),
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    # Keys present in both runs whose median got slower than baseline * (1 + tolerance)
+    regressions = []
+    for key, result in sorted(current["results"].items()):
+        old = baseline.get("results", {}).get(key)
+        if old is None:
+            continue
+        ratio = result["median_s"] / old["median_s"] if old["median_s"] > 0 else float("inf")
+        flag = "REGRESSION" if ratio > 1 + tolerance else ""
+        print(f"{key:50s} {old['median_s'] * 1e3:10.3f} ms -> {result['median_s'] * 1e3:10.3f} ms  x{ratio:5.2f} {flag}")
+        if flag:
+            regressions.append(key)
+    return regressions
+
+
+def run(args: argparse.Namespace) -> Dict:
+    results: Dict[str, Dict] = {}
+    workdir = tempfile.mkdtemp(prefix="faceattend_bench_")
+    try:
+        groups = set(args.only) if args.only else {"detect", "match", "compact", "database", "attendance"}
+        if "detect" in groups:
+            results.update(bench_detect(args.frame_sizes, args.faces, args.repeat, args.seed))
+        if "match" in groups:
+            results.update(bench_match(args.templates, args.faces, args.repeat, args.seed))
+        if "compact" in groups:
+            results.update(bench_compact(args.people, args.samples, args.probes, args.repeat, args.seed))
+        if "database" in groups:
+            results.update(bench_database(args.people, args.samples, args.repeat, args.seed, workdir))
+        if "attendance" in groups:
+            results.update(bench_attendance(args.records, args.log_calls, args.repeat, workdir))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {"environment": environment(args), "results": results}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="FaceAttend benchmark suite")
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown before flagging, 0.10 = 10%%")
+    parser.add_argument("--only", nargs="+", choices=["detect", "match", "compact", "database", "attendance"])
+    parser.add_argument("--quick", action="store_true", help="small sizes for a fast smoke run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--frame-sizes", nargs="+", default=["640x480", "1280x720", "1920x1080"])
+    parser.add_argument("--faces", type=int, default=5, help="faces per frame (K)")
+    parser.add_argument("--templates", nargs="+", type=int, default=[10, 100, 500], help="template counts (N)")
+    parser.add_argument("--people", type=int, default=100)
+    parser.add_argument("--samples", type=int, default=20, help="samples per person (M)")
+    parser.add_argument("--probes", type=int, default=500, help="probe faces scored by the compact benchmark")
+    parser.add_argument("--records", nargs="+", type=int, default=[100_000, 1_000_000])
+    parser.add_argument("--log-calls", type=int, default=1000)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.quick:
+        args.repeat = min(args.repeat, 3)
+        args.frame_sizes = ["640x480"]
+        args.templates = [10, 100]
+        args.people, args.samples = 10, 5
+        args.probes = 50
+        args.records = [10_000]
+        args.log_calls = 100
+
+    report = run(args)
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+
+import cv2
+
+from metrics import METRICS
+from pipeline import QueueEmpty
+
+
+Source = Union[int, str]
+
+
+def default_tag(source: Source) -> str:
+    if isinstance(source, int):
+        return f"cam{source}"
+    return os.path.splitext(os.path.basename(source.rstrip("/")))[0] or str(source)
+
+
+class FrameMux:
+    # Latest-frame slot per source, drained round-robin. Same get()/qsize()
+    # interface as DropOldestQueue, so it can feed a pipeline stage, but a
+    # fast camera can never crowd a slower one out.
+
+    def __init__(self) -> None:
+        self._latest: Dict[str, Any] = {}
+        self._order: List[str] = []
+        self._next = 0
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, tag: str, item: Any) -> None:
+        with self._cond:
+            if tag not in self._order:
+                self._order.append(tag)
+            if tag in self._latest:
+                self.dropped += 1
+                METRICS.inc(f"capture.{tag}.dropped")
+            self._latest[tag] = item
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        with self._cond:
+            if not self._latest:
+                self._cond.wait(timeout)
+            if not self._latest:
+                raise QueueEmpty()
+            for _ in range(len(self._order)):
+                tag = self._order[self._next % len(self._order)]
+                self._next += 1
+                if tag in self._latest:
+                    return self._latest.pop(tag)
+            raise QueueEmpty()
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._latest)
+
+
+class CaptureSource:
+    # One device index, video file or stream URL read on its own thread.
+    # Every frame goes to the mux as {"frame", "source"}; the mux keeps only
+    # the newest per source.
+
+    def __init__(self, source: Source, mux: FrameMux, tag: Optional[str] = None, flip: bool = True) -> None:
+        self.source = source
+        self.mux = mux
+        self.tag = tag or default_tag(source)
+        self.flip = flip
+        self.cap: Optional[cv2.VideoCapture] = None
+        self.fps = 0.0
+        self.frames = 0
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        # Files play back at their own frame rate instead of as fast as possible
+        self._frame_interval = 0.0
+
+    def open(self) -> bool:
+        self.cap = cv2.VideoCapture(self.source)
+        if not self.cap.isOpened():
+            return False
+        if isinstance(self.source, str) and os.path.isfile(self.source):
+            file_fps = self.cap.get(cv2.CAP_PROP_FPS)
+            self._frame_interval = 1.0 / file_fps if file_fps > 0 else 0.0
+        return True
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"capture-{self.tag}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(1.0)
+        if self.cap is not None:
+            self.cap.release()
+
+    def _run(self) -> None:
+        window_start = time.perf_counter()
+        window_count = 0
+        while self._running:
+            started = time.perf_counter()
+            ret, frame = self.cap.read()
+            if not ret:
+                time.sleep(0.01)
+                continue
+            if self.flip:
+                frame = cv2.flip(frame, 1)
+            self.mux.put(self.tag, {"frame": frame, "source": self.tag})
+
+            self.frames += 1
+            window_count += 1
+            now = time.perf_counter()
+            if now - window_start >= 1.0:
+                self.fps = window_count / (now - window_start)
+                METRICS.set_gauge(f"capture.{self.tag}.fps", round(self.fps, 2))
+                window_start, window_count = now, 0
+            if self._frame_interval:
+                time.sleep(max(0.0, self._frame_interval - (now - started)))
+
+
+def parse_sources(entries: List[Any]) -> List[Dict[str, Any]]:
+    # Config "capture.sources" entries: 0, "rtsp://...", "door.mp4" or
+    # {"source": 1, "tag": "door-b", "flip": false}. Digit strings become device indexes.
+    # Every spec gets a unique "tag": it keys the mux slot, the tracker and the
+    # attendance source, so derived tags that collide (two .../stream URLs)
+    # get -2, -3, ... appended and repeated explicit tags are an error.
+    parsed = []
+    for entry in entries:
+        spec = dict(entry) if isinstance(entry, dict) else {"source": entry}
+        if isinstance(spec["source"], str) and spec["source"].isdigit():
+            spec["source"] = int(spec["source"])
+        parsed.append(spec)
+
+    taken = set()
+    for spec in parsed:
+        tag = spec.get("tag")
+        if tag:
+            if tag in taken:
+                raise ValueError(f"duplicate capture tag {tag!r}")
+            taken.add(tag)
+    for spec in parsed:
+        if spec.get("tag"):
+            continue
+        base = tag = default_tag(spec["source"])
+        suffix = 2
+        while tag in taken:
+            tag = f"{base}-{suffix}"
+            suffix += 1
+        spec["tag"] = tag
+        taken.add(tag)
+    return parsed
@@ -0,0 +1,104 @@
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from attendance import AttendanceManager
+from engine import FrameResult
+
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_timestamp(timestamp: str) -> Optional[float]:
+    try:
+        return time.mktime(time.strptime(timestamp, TIMESTAMP_FORMAT))
+    except (ValueError, OverflowError):
+        return None
+
+
+class AutoCheckIn:
+    # Logs attendance without a click once a track has been recognized above
+    # threshold by min_frames consecutive fresh recognitions; frames that only
+    # reuse the tracker's cached identity don't count. A name -> last-logged map
+    # suppresses duplicates inside the cooldown window in O(1); it is rebuilt
+    # from the attendance store at startup.
+    #
+    # Subscribe on_frame_result to a RecognitionEngine to use it.
+
+    def __init__(
+        self,
+        attendance: AttendanceManager,
+        min_frames: int = 5,
+        cooldown: float = 3600.0,
+        enabled: bool = True,
+        on_checkin: Optional[Callable[[Dict[str, str]], None]] = None,
+    ) -> None:
+        self.attendance = attendance
+        self.min_frames = min_frames
+        self.cooldown = cooldown  # seconds
+        self.enabled = enabled
+        self.on_checkin = on_checkin
+
+        self._lock = threading.Lock()
+        self.last_logged: Dict[str, float] = {}
+        # (source, track_id) -> (name, consecutive fresh recognitions); track
+        # ids are only unique per source
+        self._streaks: Dict[Tuple[Optional[str], int], Tuple[str, int]] = {}
+        self.reload()
+
+    def reload(self) -> None:
+        last_logged: Dict[str, float] = {}
+        for name, timestamp in self.attendance.last_seen().items():
+            seen = parse_timestamp(timestamp)
+            if seen is not None:
+                last_logged[name] = seen
+        with self._lock:
+            self.last_logged = last_logged
+
+    def in_cooldown(self, name: str, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        last = self.last_logged.get(name)
+        return last is not None and now - last < self.cooldown
+
+    def mark(self, name: str, now: Optional[float] = None) -> None:
+        # Record a check-in made elsewhere (e.g. the manual confirm button)
+        with self._lock:
+            self.last_logged[name] = time.time() if now is None else now
+
+    def on_frame_result(self, result: FrameResult) -> List[Dict[str, str]]:
+        # Engine subscriber; returns the records it logged for this frame
+        if not self.enabled:
+            return []
+        logged: List[Dict[str, str]] = []
+        with self._lock:
+            # Only this frame's source is replaced; other cameras keep their streaks
+            streaks = {key: value for key, value in self._streaks.items() if key[0] != result.source}
+            for det in result.detections:
+                if not det.recognized:
+                    continue
+                key = (result.source, det.track_id)
+                name, count = self._streaks.get(key, (det.name, 0))
+                if not det.fresh:
+                    # Cached identity: keep the streak, but one recognition
+                    # must not be counted again on every following frame
+                    if name == det.name and count:
+                        streaks[key] = (name, count)
+                    continue
+                count = count + 1 if name == det.name else 1
+                streaks[key] = (det.name, count)
+                if count >= self.min_frames and not self.in_cooldown(det.name, result.timestamp):
+                    self.last_logged[det.name] = result.timestamp
+                    logged.append({
+                        "name": det.name,
+                        "timestamp": time.strftime(TIMESTAMP_FORMAT, time.localtime(result.timestamp)),
+                        "source": result.source,
+                    })
+            # Tracks that vanished or weren't recognized this frame lose their streak
+            self._streaks = streaks
+
+        for record in logged:
+            rec = self.attendance.log(record["name"], record["timestamp"], source=record["source"])
+            print(f"Auto check-in: {rec['name']} at {rec['timestamp']}")
+            if self.on_checkin is not None:
+                self.on_checkin(rec)
+        return logged
@@ -0,0 +1,130 @@
+import argparse
+import base64
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from engine import CASCADE_FILE, IMAGE_EXTENSIONS
+
+
+# Thin door client for server.py: sends camera frames, or only the faces
+# found locally with --crop, and prints who the server recognized.
+#
+#   python client.py --camera 0 --source door-a --crop --interval 0.5
+#   python client.py snapshots/ --source door-b --server http://10.0.0.5:8765
+
+
+def encode_image(img: np.ndarray, quality: int = 90) -> str:
+    ok, encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("could not encode image")
+    return base64.b64encode(encoded.tobytes()).decode("ascii")
+
+
+class RecognitionClient:
+    def __init__(self, url: str = "http://127.0.0.1:8765", source: Optional[str] = None, timeout: float = 5.0) -> None:
+        self.url = url.rstrip("/")
+        self.source = source
+        self.timeout = timeout
+
+    def recognize_frame(self, frame: np.ndarray, log: bool = True) -> List[Dict]:
+        # The server detects the faces; results carry their boxes
+        return self._post("/recognize", {"source": self.source, "frame": encode_image(frame), "log": log})["results"]
+
+    def recognize_faces(self, faces: Sequence[np.ndarray], log: bool = True) -> List[Dict]:
+        # Faces already cropped by the client; one result per face, in order
+        body = {"source": self.source, "faces": [encode_image(face) for face in faces], "log": log}
+        return self._post("/recognize", body)["results"]
+
+    def health(self) -> Dict:
+        return self._request(urllib.request.Request(f"{self.url}/health"))
+
+    def reload(self) -> Dict:
+        return self._post("/reload", {})
+
+    def _post(self, path: str, body: Dict) -> Dict:
+        data = json.dumps(body).encode("utf-8")
+        request = urllib.request.Request(
+            f"{self.url}{path}", data=data, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        return self._request(request)
+
+    def _request(self, request: urllib.request.Request) -> Dict:
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            detail = e.read().decode("utf-8", "replace")
+            raise RuntimeError(f"server returned {e.code}: {detail}") from None
+
+
+def _frames(args: argparse.Namespace):
+    # (label, BGR frame) from the camera, video files or image folders
+    if args.camera is not None:
+        cap = cv2.VideoCapture(args.camera)
+        try:
+            while cap.isOpened():
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                yield f"camera {args.camera}", cv2.flip(frame, 1)
+                time.sleep(args.interval)
+        finally:
+            cap.release()
+        return
+    for path in args.inputs:
+        files = [path]
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(IMAGE_EXTENSIONS))
+        for file in files:
+            img = cv2.imread(file)
+            if img is None:
+                print(f"Skipping {file}: could not read")
+                continue
+            yield file, cv2.flip(img, 1) if not args.no_flip else img
+
+
+def run(args: argparse.Namespace) -> None:
+    client = RecognitionClient(args.server, args.source, args.timeout)
+    print(f"Server has {client.health()['people']} people")
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + CASCADE_FILE) if args.crop else None
+    for label, frame in _frames(args):
+        try:
+            if cascade is not None:
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                boxes = cascade.detectMultiScale(gray, 1.3, 5)
+                if len(boxes) == 0:
+                    continue
+                results = client.recognize_faces([gray[y:y + h, x:x + w] for (x, y, w, h) in boxes], not args.no_log)
+            else:
+                results = client.recognize_frame(frame, not args.no_log)
+        except Exception as e:
+            print(f"{label}: request failed: {e}")
+            continue
+        for r in results:
+            who = r["name"] if r["recognized"] else "unknown"
+            print(f"{label}: {who} ({r['score']:.2f}){' - checked in' if r['logged'] else ''}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="FaceAttend thin client for server.py")
+    parser.add_argument("inputs", nargs="*", help="images or directories of images (instead of --camera)")
+    parser.add_argument("--camera", type=int, help="camera index to stream from")
+    parser.add_argument("--server", default="http://127.0.0.1:8765")
+    parser.add_argument("--source", help="tag stored with this door's attendance records")
+    parser.add_argument("--crop", action="store_true", help="detect locally and send only the face crops")
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between camera frames")
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument("--no-log", action="store_true", help="only ask who it is; don't record attendance")
+    parser.add_argument("--no-flip", action="store_true", help="don't mirror images like the live camera does")
+    return parser
+
+
+if __name__ == "__main__":
+    run(build_parser().parse_args())
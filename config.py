@@ -0,0 +1,42 @@
+import json
+import os
+from dataclasses import fields
+from typing import Any, Dict, Optional, Sequence, Type, TypeVar
+
+
+# Optional JSON settings file. Each component reads its own section, e.g.
+#   {"detection": {"detect_width": 640, "roi": [0.25, 0.0, 0.5, 1.0]}}
+# See faceattend.example.json for every supported key.
+DEFAULT_CONFIG_PATH = "faceattend.json"
+
+T = TypeVar("T")
+
+
+def load_config(path: Optional[str] = None) -> Dict[str, Any]:
+    # path, else $FACEATTEND_CONFIG, else faceattend.json; missing file = defaults
+    path = path or os.environ.get("FACEATTEND_CONFIG") or DEFAULT_CONFIG_PATH
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        if not isinstance(config, dict):
+            raise ValueError("top level must be an object")
+        return config
+    except Exception as e:
+        print(f"Error loading config {path}: {e}")
+        return {}
+
+
+def dataclass_from_dict(cls: Type[T], values: Dict[str, Any], section: str, tuple_fields: Sequence[str] = ()) -> T:
+    # Build a settings dataclass from its config section: unknown keys are
+    # reported and skipped, JSON lists in tuple_fields become tuples
+    known = {f.name for f in fields(cls)}
+    unknown = set(values) - known
+    if unknown:
+        print(f"Ignoring unknown {section} settings: {', '.join(sorted(unknown))}")
+    kwargs = {k: v for k, v in values.items() if k in known}
+    for key in tuple_fields:
+        if kwargs.get(key) is not None:
+            kwargs[key] = tuple(kwargs[key])
+    return cls(**kwargs)
@@ -0,0 +1,100 @@
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import dataclass_from_dict
+from metrics import METRICS
+
+
+Box = Tuple[int, int, int, int]
+
+
+@dataclass
+class DetectorConfig:
+    # Haar detection settings; the defaults reproduce detectMultiScale(gray, 1.3, 5)
+    detect_width: Optional[int] = None  # downscale wider frames/ROIs to this width before detecting
+    roi: Optional[Tuple[float, float, float, float]] = None  # (x, y, w, h) as fractions of the frame
+    min_face: int = 0  # smallest face to look for, in full-resolution pixels
+    max_face: int = 0  # largest face to look for, in full-resolution pixels; 0 = no limit
+    scale_factor: float = 1.3
+    min_neighbors: int = 5
+    adaptive: bool = False  # tune scale_factor/min_neighbors to hold target_latency_ms
+    target_latency_ms: float = 25.0
+    scale_factor_range: Tuple[float, float] = (1.1, 1.5)
+    min_neighbors_range: Tuple[int, int] = (3, 8)
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "DetectorConfig":
+        return dataclass_from_dict(cls, values, "detection", ("roi", "scale_factor_range", "min_neighbors_range"))
+
+
+class FaceDetector:
+    # Runs the cascade on a downscaled, ROI-cropped view of the frame with
+    # size limits, and maps the boxes back to full-resolution coordinates
+
+    def __init__(self, cascade: cv2.CascadeClassifier, config: Optional[DetectorConfig] = None) -> None:
+        self.cascade = cascade
+        self.config = config or DetectorConfig()
+        self.scale_factor = self.config.scale_factor
+        self.min_neighbors = self.config.min_neighbors
+        self.latency_ms = 0.0  # exponential moving average
+
+    def detect(self, gray: np.ndarray) -> List[Box]:
+        cfg = self.config
+        frame_h, frame_w = gray.shape[:2]
+
+        ox, oy = 0, 0
+        region = gray
+        if cfg.roi is not None:
+            rx, ry, rw, rh = cfg.roi
+            ox, oy = int(rx * frame_w), int(ry * frame_h)
+            region = gray[oy:oy + int(rh * frame_h), ox:ox + int(rw * frame_w)]
+            if region.size == 0:
+                return []
+
+        scale = 1.0
+        if cfg.detect_width and region.shape[1] > cfg.detect_width:
+            scale = cfg.detect_width / region.shape[1]
+            region = cv2.resize(region, (cfg.detect_width, max(1, int(region.shape[0] * scale))),
+                                interpolation=cv2.INTER_AREA)
+
+        kwargs = {}
+        if cfg.min_face:
+            side = max(1, int(cfg.min_face * scale))
+            kwargs["minSize"] = (side, side)
+        if cfg.max_face:
+            side = max(1, int(cfg.max_face * scale))
+            kwargs["maxSize"] = (side, side)
+
+        start = time.perf_counter()
+        boxes = self.cascade.detectMultiScale(region, self.scale_factor, self.min_neighbors, **kwargs)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        if cfg.adaptive:
+            self._adapt(elapsed_ms)
+
+        return [
+            (int(x / scale) + ox, int(y / scale) + oy, int(w / scale), int(h / scale))
+            for (x, y, w, h) in boxes
+        ]
+
+    def _adapt(self, elapsed_ms: float) -> None:
+        # Over budget: coarser pyramid (larger scale_factor). Well under: finer.
+        # Finer pyramids yield more overlapping hits per face, so min_neighbors
+        # moves the opposite way to keep false positives in check.
+        cfg = self.config
+        self.latency_ms = elapsed_ms if self.latency_ms == 0.0 else 0.8 * self.latency_ms + 0.2 * elapsed_ms
+        lo, hi = cfg.scale_factor_range
+        if self.latency_ms > cfg.target_latency_ms * 1.1:
+            self.scale_factor = min(hi, self.scale_factor + 0.02)
+        elif self.latency_ms < cfg.target_latency_ms * 0.7:
+            self.scale_factor = max(lo, self.scale_factor - 0.02)
+        else:
+            return
+        position = (self.scale_factor - lo) / (hi - lo) if hi > lo else 0.0
+        n_lo, n_hi = cfg.min_neighbors_range
+        self.min_neighbors = int(round(n_hi - position * (n_hi - n_lo)))
+        METRICS.set_gauge("detect.scale_factor", round(self.scale_factor, 3))
+        METRICS.set_gauge("detect.min_neighbors", self.min_neighbors)
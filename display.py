@@ -0,0 +1,68 @@
+import threading
+import time
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+
+class PreviewBuffer:
+    # Latest preview frame, resized and converted to RGB with OpenCV into
+    # preallocated buffers. A worker thread submits frames; the Tk thread
+    # takes the newest one on its own tick, so the preview rate is set by the
+    # UI and never by how fast frames are recognized.
+    #
+    # Three buffers rotate between "being written", "ready" and "being shown",
+    # so neither side ever waits for or tears the other's frame.
+
+    def __init__(self, size: Tuple[int, int] = (640, 480), max_fps: float = 30.0) -> None:
+        self.size = size  # (width, height)
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        width, height = size
+        self._buffers = [np.zeros((height, width, 3), dtype=np.uint8) for _ in range(3)]
+        self._scratch = np.empty((height, width, 3), dtype=np.uint8)
+        self._lock = threading.Lock()
+        self._ready: Optional[int] = None
+        self._showing: Optional[int] = None
+        self._version = 0
+        self._taken = 0
+        self._last_submit = 0.0
+        self.dropped = 0
+
+    def submit(self, frame_bgr: np.ndarray) -> bool:
+        # Worker side; frames arriving faster than max_fps are skipped before any work
+        now = time.perf_counter()
+        if now - self._last_submit < self.min_interval:
+            self.dropped += 1
+            return False
+        self._last_submit = now
+        with self._lock:
+            index = next(i for i in range(3) if i != self._ready and i != self._showing)
+        target = self._buffers[index]
+        if frame_bgr.shape[1::-1] != self.size:
+            cv2.resize(frame_bgr, self.size, dst=self._scratch, interpolation=cv2.INTER_LINEAR)
+            cv2.cvtColor(self._scratch, cv2.COLOR_BGR2RGB, dst=target)
+        else:
+            cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB, dst=target)
+        with self._lock:
+            self._ready = index
+            self._version += 1
+        return True
+
+    def take(self) -> Optional[np.ndarray]:
+        # Tk side: the newest RGB frame if it hasn't been shown yet, else None.
+        # The array stays untouched until the next take().
+        with self._lock:
+            if self._ready is None or self._version == self._taken:
+                return None
+            self._showing = self._ready
+            self._taken = self._version
+            return self._buffers[self._showing]
+
+    def take_image(self) -> Optional[Image.Image]:
+        # take() wrapped as a PIL image sharing the buffer, ready for PhotoImage.paste
+        frame = self.take()
+        if frame is None:
+            return None
+        return Image.frombuffer("RGB", self.size, frame, "raw", "RGB", 0, 1)
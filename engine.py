@@ -0,0 +1,214 @@
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from attendance import AttendanceManager
+from detection import DetectorConfig, FaceDetector
+from face_db import FaceDatabase
+from matcher import TemplateConfig
+from metrics import METRICS, SCORE_BUCKETS
+from tracker import FaceTracker, Track
+
+
+CASCADE_FILE = "haarcascade_frontalface_default.xml"
+# Photo files read by enroll.py, batch.py and client.py
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Detection:
+    # One tracked face in a frame. name/score are the best match even when
+    # below threshold; recognized says whether it cleared the threshold.
+    track_id: int
+    box: Tuple[int, int, int, int]
+    name: Optional[str]
+    score: float
+    recognized: bool
+    fresh: bool  # recognition actually ran for this face on this frame
+
+
+@dataclass
+class FrameResult:
+    frame_index: int
+    timestamp: float
+    detections: List[Detection] = field(default_factory=list)
+    database_empty: bool = False
+    source: Optional[str] = None  # capture source tag when several cameras share the engine
+
+
+class RecognitionEngine:
+    # Headless recognition: frames in, FrameResult events out. Owns the
+    # cascade, face database, tracker and attendance manager; no GUI code.
+    # Frames from several cameras can share one engine: pass each camera's
+    # tag as source and it gets its own tracker, while templates, detector
+    # and attendance are shared.
+
+    def __init__(
+        self,
+        db: Optional[FaceDatabase] = None,
+        attendance: Optional[AttendanceManager] = None,
+        tracker: Optional[FaceTracker] = None,
+        cascade_path: Optional[str] = None,
+        recognition_threshold: float = 0.6,
+        detector_config: Optional[DetectorConfig] = None,
+        template_config: Optional[TemplateConfig] = None,
+    ) -> None:
+        self.face_cascade = cv2.CascadeClassifier(cascade_path or cv2.data.haarcascades + CASCADE_FILE)
+        self.detector = FaceDetector(self.face_cascade, detector_config)
+        if db is None:
+            db = FaceDatabase(template_config=template_config)
+            db.load()
+        self.db = db
+        self._attendance = attendance
+        self.tracker = tracker if tracker is not None else FaceTracker()
+        self._source_trackers: Dict[str, FaceTracker] = {}
+        self.recognition_threshold = recognition_threshold  # 0-1, higher = stricter
+        self._subscribers: List[Callable[[FrameResult], None]] = []
+
+    @property
+    def attendance(self) -> AttendanceManager:
+        # Created on first use, so engines that never log skip loading the history
+        if self._attendance is None:
+            self._attendance = AttendanceManager()
+        return self._attendance
+
+    def subscribe(self, callback: Callable[[FrameResult], None]) -> None:
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[FrameResult], None]) -> None:
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def detect(self, gray: np.ndarray) -> Sequence[Tuple[int, int, int, int]]:
+        METRICS.inc("detections.runs")
+        with METRICS.timer("detect.cascade.seconds"):
+            return self.detector.detect(gray)
+
+    def tracker_for(self, source: Optional[str] = None) -> FaceTracker:
+        # Each source gets a tracker configured like self.tracker, created on first use
+        if source is None:
+            return self.tracker
+        tracker = self._source_trackers.get(source)
+        if tracker is None:
+            tracker = self._source_trackers[source] = FaceTracker(
+                detect_interval=self.tracker.detect_interval,
+                recognize_interval=self.tracker.recognize_interval,
+                min_confidence=self.tracker.min_confidence,
+                iou_threshold=self.tracker.iou_threshold,
+                max_missed=self.tracker.max_missed,
+                confirm_frames=self.tracker.confirm_frames,
+            )
+        return tracker
+
+    def set_confirm_frames(self, frames: int) -> None:
+        # How many fresh recognitions must agree before an identity is cached, on every source
+        for tracker in [self.tracker, *self._source_trackers.values()]:
+            tracker.confirm_frames = frames
+
+    def track(self, gray: np.ndarray, source: Optional[str] = None) -> List[Track]:
+        # Detection step: runs the cascade only when the tracker asks for it
+        return self.tracker_for(source).step(gray, self.detect)
+
+    def recognize(self, gray: np.ndarray, tracks: List[Track], source: Optional[str] = None) -> FrameResult:
+        # Recognition step: scores new/stale tracks in one batch, reuses cached
+        # identities for the rest, then publishes the result to subscribers
+        tracker = self.tracker_for(source)
+        result = FrameResult(frame_index=tracker.frame_index, timestamp=time.time(), source=source)
+        matcher = self.db.matcher
+        METRICS.inc("frames")
+        if source is not None:
+            METRICS.inc(f"frames.{source}")
+        METRICS.inc("faces", len(tracks))
+        METRICS.set_gauge("templates", len(matcher))
+        if len(matcher) == 0:
+            result.database_empty = True
+            result.detections = [Detection(t.track_id, t.box, None, 0.0, False, False) for t in tracks]
+            self._publish(result)
+            return result
+
+        pending = [t for t in tracks if tracker.needs_recognition(t, matcher)]
+        if pending:
+            debug = logger.isEnabledFor(logging.DEBUG)
+            try:
+                boxes = [t.box for t in pending]
+                with METRICS.timer("recognize.match.seconds"):
+                    matches = matcher.match_boxes(gray, boxes, top_k=len(matcher) if debug else 1)
+                METRICS.inc("recognitions", len(pending))
+                for track, face_matches in zip(pending, matches):
+                    name, score = face_matches[0]
+                    METRICS.observe("match.score", score, SCORE_BUCKETS)
+                    if debug:
+                        for candidate, candidate_score in face_matches:
+                            logger.debug("Track %d vs %s: correlation = %.3f", track.track_id, candidate, candidate_score)
+                        logger.debug(
+                            "Best match: %s with score %.3f (threshold: %.3f)", name, score, self.recognition_threshold
+                        )
+                    tracker.set_identity(track, gray, name, score, matcher)
+            except Exception as e:
+                METRICS.inc("recognitions.errors")
+                logger.error("Recognition error: %s", e)
+
+        fresh_ids = {t.track_id for t in pending}
+        for t in tracks:
+            recognized = t.name is not None and t.score > self.recognition_threshold
+            if recognized:
+                METRICS.inc("faces.recognized")
+            result.detections.append(
+                Detection(t.track_id, t.box, t.name, t.score, recognized, t.track_id in fresh_ids)
+            )
+        self._publish(result)
+        return result
+
+    @staticmethod
+    def to_gray(frame: np.ndarray) -> np.ndarray:
+        return frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+    def process_frame(self, frame: np.ndarray, source: Optional[str] = None) -> FrameResult:
+        # Convenience for callers without a pipeline: BGR or gray frame in, result out
+        gray = self.to_gray(frame)
+        return self.recognize(gray, self.track(gray, source), source)
+
+    def warm_up(self, size: Tuple[int, int] = (640, 480)) -> None:
+        # One throwaway detect and match on a blank frame, so first-call costs
+        # (cascade buffers, template pages faulted in from the store, aligner
+        # spectra) are paid at startup rather than on the first real frame.
+        # The cascade is called directly so the slow first call doesn't feed
+        # the adaptive detector's latency estimate; nothing is published.
+        gray = np.zeros((size[1], size[0]), dtype=np.uint8)
+        self.face_cascade.detectMultiScale(gray, self.detector.scale_factor, self.detector.min_neighbors)
+        matcher = self.db.matcher
+        if matcher.rows:
+            matcher.match_boxes(gray, [(0, 0, size[0] // 4, size[0] // 4)])
+
+    def log_attendance(self, name: str, source: Optional[str] = None):
+        return self.attendance.log(name, source=source)
+
+    @staticmethod
+    def annotate(frame: np.ndarray, result: FrameResult) -> None:
+        # Draw boxes, and labels for recognized faces, onto a BGR frame in place
+        for det in result.detections:
+            x, y, w, h = det.box
+            cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+            if det.recognized:
+                cv2.putText(
+                    frame,
+                    f"{det.name} ({det.score:.2f})",
+                    (x, y - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX,
+                    0.7,
+                    (0, 255, 0),
+                    2,
+                )
+
+    def _publish(self, result: FrameResult) -> None:
+        for callback in list(self._subscribers):
+            try:
+                callback(result)
+            except Exception as e:
+                logger.error("Engine subscriber error: %s", e)
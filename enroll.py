@@ -0,0 +1,262 @@
+import argparse
+import csv
+import multiprocessing
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from config import load_config
+from engine import CASCADE_FILE, IMAGE_EXTENSIONS
+from face_db import FaceDatabase
+from matcher import TemplateConfig
+
+
+# Bulk enrollment from photos instead of the live camera.
+#
+#   python enroll.py roster.zip extra_photos/ --workers 4 --report enrollment.csv
+#
+# Inputs are directories or .zip archives laid out either as one folder per
+# person (alice/1.jpg, alice/2.jpg) or as flat files named after the person
+# (alice.jpg, alice_2.jpg). A single folder wrapping the whole tree, as zips
+# often have, is ignored. The largest Haar face of each photo is cropped,
+# resized to the template size and written to faces_db; the names mapping is
+# then saved and the model retrained once.
+
+REPORT_FIELDS = ["source", "name", "status", "faces", "reason"]
+
+# Per-worker state, built once by _init_worker
+_cascade: Optional[cv2.CascadeClassifier] = None
+_options: Dict = {}
+_archives: Dict[str, zipfile.ZipFile] = {}
+
+
+def _init_worker(options: Dict) -> None:
+    global _cascade, _options
+    _options = options
+    _cascade = cv2.CascadeClassifier(cv2.data.haarcascades + CASCADE_FILE)
+
+
+def _is_image(path: str) -> bool:
+    parts = path.replace("\\", "/").split("/")
+    return path.lower().endswith(IMAGE_EXTENSIONS) and not any(p.startswith((".", "__MACOSX")) for p in parts)
+
+
+def _person_names(paths: List[str]) -> List[Optional[str]]:
+    # Person name for each relative path: its top folder, or for files at
+    # the top level the file name minus any _N / -N suffix
+    split = [p.replace("\\", "/").split("/") for p in paths]
+    if split and all(len(parts) >= 3 for parts in split) and len({parts[0] for parts in split}) == 1:
+        split = [parts[1:] for parts in split]
+    names = []
+    for parts in split:
+        name = parts[0] if len(parts) > 1 else re.sub(r"[_\- ]\d+$", "", os.path.splitext(parts[0])[0])
+        name = name.strip()
+        names.append(name if name and name not in (".", "..") else None)
+    return names
+
+
+def collect_images(source: str) -> List[Dict]:
+    # Work items for one directory or zip: {"source", "name", "path", "member"}
+    if os.path.isdir(source):
+        relpaths = []
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for f in sorted(files):
+                rel = os.path.relpath(os.path.join(root, f), source)
+                if _is_image(rel):
+                    relpaths.append(rel)
+        return [
+            {"source": os.path.join(source, rel), "name": name, "path": os.path.join(source, rel), "member": None}
+            for rel, name in zip(relpaths, _person_names(relpaths))
+        ]
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as zf:
+            members = sorted(m for m in zf.namelist() if not m.endswith("/") and _is_image(m))
+        return [
+            {"source": f"{source}:{member}", "name": name, "path": source, "member": member}
+            for member, name in zip(members, _person_names(members))
+        ]
+    print(f"Skipping {source}: not a directory or zip archive")
+    return []
+
+
+def _read_gray(item: Dict) -> Optional[np.ndarray]:
+    if item["member"] is None:
+        return cv2.imread(item["path"], cv2.IMREAD_GRAYSCALE)
+    archive = _archives.get(item["path"])
+    if archive is None:
+        archive = _archives[item["path"]] = zipfile.ZipFile(item["path"])
+    data = np.frombuffer(archive.read(item["member"]), dtype=np.uint8)
+    return cv2.imdecode(data, cv2.IMREAD_GRAYSCALE)
+
+
+def crop_face(
+    gray: np.ndarray,
+    cascade: cv2.CascadeClassifier,
+    size: Tuple[int, int],
+    min_face: int = 50,
+    max_side: int = 1024,
+) -> Tuple[Optional[np.ndarray], int, str]:
+    # (face resized to size, faces found, failure reason). Detection runs on a
+    # copy shrunk to max_side; the crop comes from the full-resolution photo.
+    scale = min(1.0, max_side / max(gray.shape[:2]))
+    small = gray if scale >= 1.0 else cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    side = max(1, int(min_face * scale))
+    faces = cascade.detectMultiScale(small, 1.1, 5, minSize=(side, side))
+    if len(faces) == 0:
+        return None, 0, "no face found"
+    x, y, w, h = (int(v / scale) for v in max(faces, key=lambda f: f[2] * f[3]))
+    if w < min_face or h < min_face:
+        return None, len(faces), "face too small"
+    interpolation = cv2.INTER_AREA if w > size[0] else cv2.INTER_LINEAR
+    return cv2.resize(gray[y:y + h, x:x + w], size, interpolation=interpolation), len(faces), ""
+
+
+def process_image(item: Dict) -> Dict:
+    # Runs in a worker process; returns the report row plus the samples
+    row = {"source": item["source"], "name": item["name"] or "", "status": "failed", "faces": 0, "reason": "", "samples": []}
+    try:
+        gray = _read_gray(item)
+    except Exception as e:
+        row["reason"] = f"unreadable: {e}"
+        return row
+    if gray is None:
+        row["reason"] = "unreadable image"
+        return row
+    face, row["faces"], row["reason"] = crop_face(
+        gray, _cascade, tuple(_options["size"]), _options["min_face"], _options["max_side"]
+    )
+    if face is not None:
+        # The live camera is mirrored, so mirrored photos are kept as well
+        row["samples"] = [face, cv2.flip(face, 1)] if _options["mirror"] else [face]
+        row["status"] = "enrolled"
+        if row["faces"] > 1:
+            row["reason"] = f"{row['faces']} faces, used the largest"
+    return row
+
+
+def enroll(
+    sources: List[str],
+    db: FaceDatabase,
+    workers: Optional[int] = None,
+    mirror: bool = True,
+    skip_existing: bool = False,
+    min_face: int = 50,
+    max_side: int = 1024,
+    retrain: bool = True,
+) -> List[Dict]:
+    # Crop every photo in sources in parallel, hand all samples to
+    # db.add_people in one go and return one report row per photo
+    items = [item for source in sources for item in collect_images(source)]
+    rows: List[Dict] = []
+    todo: List[Dict] = []
+    for item in items:
+        if item["name"] is None:
+            rows.append({"source": item["source"], "name": "", "status": "failed", "faces": 0, "reason": "no person name"})
+        elif skip_existing and item["name"] in db.known_faces:
+            rows.append({"source": item["source"], "name": item["name"], "status": "skipped", "faces": 0, "reason": "already enrolled"})
+        else:
+            todo.append(item)
+
+    options = {
+        "size": db.template_config.template_size,
+        "mirror": mirror,
+        "min_face": min_face,
+        "max_side": max_side,
+    }
+    workers = max(1, min(workers or os.cpu_count() or 1, len(todo) or 1))
+    if workers == 1:
+        _init_worker(options)
+        results = [process_image(item) for item in todo]
+    else:
+        # spawn, not fork, as in FaceDatabase.train_model: callers may have live threads
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(options,)) as pool:
+            results = list(pool.map(process_image, todo, chunksize=max(1, len(todo) // (workers * 4))))
+
+    people: Dict[str, List[np.ndarray]] = {}
+    for row in results:
+        people.setdefault(row["name"], []).extend(row.pop("samples"))
+    people = {name: samples for name, samples in people.items() if samples}
+    rows.extend(results)
+    if people:
+        db.add_people(people, retrain=retrain)
+    return rows
+
+
+def write_report(path: str, rows: List[Dict]) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run(args: argparse.Namespace) -> Dict:
+    config = load_config(args.config)
+    db = FaceDatabase(
+        faces_db_path=args.faces_db,
+        store_path=args.store,
+        train_workers=args.workers,
+        template_config=TemplateConfig.from_dict(config.get("templates", {})),
+    )
+    db.load()
+    before = set(db.known_faces)
+
+    started = time.perf_counter()
+    rows = enroll(
+        args.inputs,
+        db,
+        workers=args.workers,
+        mirror=not args.no_mirror,
+        skip_existing=args.skip_existing,
+        min_face=args.min_face,
+        max_side=args.max_side,
+        retrain=not args.no_retrain,
+    )
+    elapsed = time.perf_counter() - started
+    if args.report:
+        write_report(args.report, rows)
+
+    for row in rows:
+        if row["status"] == "failed":
+            print(f"Failed: {row['source']}: {row['reason']}")
+    counts = {status: sum(1 for r in rows if r["status"] == status) for status in ("enrolled", "failed", "skipped")}
+    enrolled = {r["name"] for r in rows if r["status"] == "enrolled"}
+    summary = {
+        "images": len(rows),
+        **counts,
+        "people": len(enrolled),
+        "new_people": len(enrolled - before),
+        "seconds": round(elapsed, 3),
+    }
+    print(
+        f"Enrolled {counts['enrolled']} of {len(rows)} images for {len(enrolled)} people "
+        f"({summary['new_people']} new, {counts['failed']} failed, {counts['skipped']} skipped) in {elapsed:.2f}s"
+    )
+    return summary
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="FaceAttend bulk enrollment from photos")
+    parser.add_argument("inputs", nargs="+", help="directories and/or .zip archives of photos")
+    parser.add_argument("--report", help="per-image report CSV (source, name, status, faces, reason)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: one per CPU)")
+    parser.add_argument("--min-face", type=int, default=50, help="smallest face side accepted, in photo pixels")
+    parser.add_argument("--max-side", type=int, default=1024, help="photos are shrunk to this size for detection")
+    parser.add_argument("--skip-existing", action="store_true", help="leave people already in the database alone")
+    parser.add_argument("--no-mirror", action="store_true", help="don't also store a mirrored copy of each face")
+    parser.add_argument("--no-retrain", action="store_true", help="only write samples; retrain later")
+    parser.add_argument("--config", help="settings JSON (default: $FACEATTEND_CONFIG or faceattend.json)")
+    parser.add_argument("--faces-db", default="faces_db")
+    parser.add_argument("--store", default="face_templates.bin")
+    return parser
+
+
+if __name__ == "__main__":
+    run(build_parser().parse_args())
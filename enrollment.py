@@ -0,0 +1,136 @@
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from config import dataclass_from_dict
+from matcher import TEMPLATE_SIZE
+
+
+Box = Tuple[int, int, int, int]
+
+
+@dataclass
+class EnrollmentConfig:
+    # Live enrollment settings ("enrollment" section of the config)
+    samples: int = 20  # session completes after this many samples
+    min_samples: int = 5  # fewest samples worth saving when stopped early
+    min_face: int = 50  # smallest face side accepted, in frame pixels
+    min_sharpness: float = 30.0  # variance of the Laplacian of the resized face
+    max_similarity: float = 0.95  # a new sample must differ this much from every kept one
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "EnrollmentConfig":
+        return dataclass_from_dict(cls, values, "enrollment")
+
+
+def sharpness(face: np.ndarray) -> float:
+    return float(cv2.Laplacian(face, cv2.CV_32F).var())
+
+
+def _descriptor(face: np.ndarray) -> np.ndarray:
+    # Small zero-mean unit vector; near-identical frames have cosine ~1
+    v = cv2.resize(face, (24, 24), interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+    v -= v.mean()
+    return v / (np.linalg.norm(v) + 1e-6)
+
+
+class EnrollmentSession:
+    # Collects one person's samples from frames the live pipeline already
+    # has, using the boxes the tracker already found. Only boxes the cascade
+    # placed on that very frame are used; tracked boxes can be several
+    # frames old while the person is turning their head. A face is kept when it
+    # is large and sharp enough and differs from every kept sample (head
+    # pose, expression); a face too similar to a kept one replaces it only
+    # if it is sharper. offer() runs on the recognition thread, the Tk
+    # thread reads progress and calls finish().
+
+    def __init__(
+        self,
+        name: str,
+        config: Optional[EnrollmentConfig] = None,
+        size: Tuple[int, int] = TEMPLATE_SIZE,
+    ) -> None:
+        self.name = name
+        self.config = config or EnrollmentConfig()
+        self.size = size
+        self.samples: List[np.ndarray] = []
+        self.hint = "Look at the camera"
+        self.last_box: Optional[Box] = None
+        self.captured_frames = 0  # frames left to flash the box after a capture
+        self._qualities: List[float] = []
+        self._descriptors: List[np.ndarray] = []
+        self._closed = False
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return len(self.samples) >= self.config.samples
+
+    @property
+    def progress(self) -> str:
+        return f"{len(self.samples)}/{self.config.samples}"
+
+    def offer(self, gray: np.ndarray, tracks: Sequence[Any], frame_index: int) -> bool:
+        # Consider the largest tracked face of a frame; True if it was kept.
+        # frame_index is the tracker's index for this frame.
+        cfg = self.config
+        with self._lock:
+            if self._closed or self.done:
+                return False
+            self.captured_frames = max(0, self.captured_frames - 1)
+            if not tracks:
+                self.last_box = None
+                self.hint = "Look at the camera"
+                return False
+            track = max(tracks, key=lambda t: t.box[2] * t.box[3])
+            x, y, w, h = track.box
+            self.last_box = track.box
+            if min(w, h) < cfg.min_face:
+                self.hint = "Move closer"
+                return False
+            if track.detected_frame != frame_index:
+                return False
+            face = cv2.resize(gray[y:y + h, x:x + w], self.size, interpolation=cv2.INTER_AREA)
+            quality = sharpness(face)
+            if quality < cfg.min_sharpness:
+                self.hint = "Hold still"
+                return False
+
+            descriptor = _descriptor(face)
+            if self._descriptors:
+                similarity = np.stack(self._descriptors) @ descriptor
+                closest = int(np.argmax(similarity))
+                if similarity[closest] > cfg.max_similarity:
+                    if quality > self._qualities[closest]:
+                        # Same pose but sharper: keep this one instead
+                        self.samples[closest] = face
+                        self._qualities[closest] = quality
+                        self._descriptors[closest] = descriptor
+                    self.hint = "Turn your head slightly"
+                    return False
+            self.samples.append(face)
+            self._qualities.append(quality)
+            self._descriptors.append(descriptor)
+            self.captured_frames = 3
+            self.hint = "Done" if self.done else "Captured - keep moving slowly"
+            return True
+
+    def finish(self) -> List[np.ndarray]:
+        # Stop taking samples and return the ones kept
+        with self._lock:
+            self._closed = True
+            return list(self.samples)
+
+    def annotate(self, frame: np.ndarray) -> None:
+        # Box (yellow just after a capture) and progress on the preview frame
+        box = self.last_box
+        if box is not None:
+            x, y, w, h = box
+            color = (0, 255, 255) if self.captured_frames else (0, 255, 0)
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 3 if self.captured_frames else 2)
+        cv2.putText(frame, f"Enrolling {self.name}: {self.progress}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+        cv2.putText(frame, self.hint, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
@@ -1,112 +1,620 @@
 import os
 import pickle
-from typing import Dict, List
+import multiprocessing
+import shutil
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional, Tuple
 import cv2
 import numpy as np
 
+from matcher import (
+    TemplateConfig,
+    TemplateMatcher,
+    TEMPLATE_SIZE,
+    extend_projection,
+    kmeans,
+    normalize_rows,
+    quantize,
+    resize_templates,
+)
+from sample_cache import load_cached_samples
+from template_store import StoreError, read_store, write_store
+
+
+def _sample_files(person_dir: str) -> List[str]:
+    if not os.path.isdir(person_dir):
+        return []
+    return [f for f in sorted(os.listdir(person_dir)) if f.lower().endswith('.jpg')]
+
+
+def _next_sample_index(person_dir: str) -> int:
+    # First free N for N.jpg, so new samples never overwrite existing ones
+    indices = [int(f[:-4]) for f in _sample_files(person_dir) if f[:-4].isdigit()]
+    return max(indices) + 1 if indices else 0
+
+
+def _write_samples(person_dir: str, start: int, face_samples: List[np.ndarray]) -> List[np.ndarray]:
+    # Save faces as start.jpg, start+1.jpg, ... and return them as decoded
+    # from the JPEGs, exactly as a full rebuild will see them
+    stored: List[np.ndarray] = []
+    for i, face in enumerate(face_samples, start):
+        ok, encoded = cv2.imencode(".jpg", face)
+        if not ok:
+            continue
+        with open(os.path.join(person_dir, f"{i}.jpg"), 'wb') as f:
+            f.write(encoded.tobytes())
+        stored.append(cv2.imdecode(encoded, cv2.IMREAD_GRAYSCALE))
+    return stored
+
+
+def _to_size(face: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    if face.shape[:2] != (size[1], size[0]):
+        face = cv2.resize(face, size)
+    return np.float32(face)
+
+
+def load_person_samples(
+    person_dir: str, size: Tuple[int, int] = TEMPLATE_SIZE, use_cache: bool = False
+) -> List[np.ndarray]:
+    # Decode and resize every sample image of one person; with use_cache,
+    # unchanged files come from the person's sample cache instead
+    if use_cache:
+        return load_cached_samples(person_dir, _sample_files(person_dir), size)
+    samples: List[np.ndarray] = []
+    for filename in _sample_files(person_dir):
+        img = cv2.imread(os.path.join(person_dir, filename), cv2.IMREAD_GRAYSCALE)
+        if img is not None:
+            samples.append(_to_size(img, size))
+    return samples
+
+
+def build_prototypes(samples: List[np.ndarray], mode: str, k: int) -> Optional[np.ndarray]:
+    # (n, 100, 100) templates for one person: every sample ("all"), or the
+    # means of k clusters of the samples ("kmeans"); None in "mean" mode
+    if mode == "mean" or not samples:
+        return None
+    stacked = np.stack(samples).astype(np.float32)
+    if mode == "all" or len(stacked) <= k:
+        return stacked
+    # Cluster on normalized rows so lighting doesn't decide the groups
+    _, labels = kmeans(normalize_rows(stacked.reshape(len(stacked), -1)), k)
+    return np.stack([stacked[labels == c].mean(axis=0) for c in np.unique(labels)])
+
+
+def _train_person_task(
+    person_dir: str,
+    mode: str = "mean",
+    k: int = 5,
+    size: Tuple[int, int] = TEMPLATE_SIZE,
+    use_cache: bool = False,
+) -> Tuple[Optional[np.ndarray], int, Optional[np.ndarray]]:
+    # Worker-side: decode one person's samples and return only their sum,
+    # count and (outside "mean" mode) prototypes
+    samples = load_person_samples(person_dir, size, use_cache)
+    if not samples:
+        return None, 0, None
+    return np.sum(samples, axis=0, dtype=np.float32), len(samples), build_prototypes(samples, mode, k)
+
 
 class FaceDatabase:
 
     def __init__(
         self,
         faces_db_path: str = "faces_db",
-        templates_path: str = "face_templates.pkl",
-        names_path: str = "names.pkl",
+        store_path: str = "face_templates.bin",
+        legacy_templates_path: str = "face_templates.pkl",
+        legacy_names_path: str = "names.pkl",
+        train_workers: Optional[int] = None,
+        template_config: Optional[TemplateConfig] = None,
+        sample_cache: bool = True,
+        verify_store: bool = False,
     ) -> None:
         self.faces_db_path = faces_db_path
-        self.templates_path = templates_path
-        self.names_path = names_path
+        # Templates, names and sample counts live together in one memory-mapped
+        # store; the old pickles are only read once to migrate them
+        self.store_path = store_path
+        self.legacy_templates_path = legacy_templates_path
+        self.legacy_names_path = legacy_names_path
+        # Incremental adds write one small update file per change into this
+        # directory instead of rewriting the store; the next full save (a
+        # retrain, or once max_updates have piled up) folds them back in
+        self.updates_path = f"{store_path}.updates"
+        self.max_updates = 64
+        # Checksum every stored array on load, not just the header; this reads
+        # the whole file instead of mapping it lazily
+        self.verify_store = verify_store
+        # Worker processes for a full retrain; None = one per CPU, 1 = in-process
+        self.train_workers = train_workers
+        # Templates per person and how they are matched (see TemplateConfig)
+        self.template_config = template_config or TemplateConfig()
+        # Keep decoded samples in a per-person sidecar so retraining only decodes changed images
+        self.sample_cache = sample_cache
 
         # In-memory
         self.known_faces: Dict[str, int] = {}
         self.face_templates: Dict[str, np.ndarray] = {}
+        # Running per-person sums and counts, so template = sum / count can be
+        # updated from new samples alone
+        self.template_sums: Dict[str, np.ndarray] = {}
+        self.sample_counts: Dict[str, int] = {}
+        self._stored_counts: Dict[str, int] = {}
+        # name -> (k, size, size) templates outside "mean" mode
+        self.face_prototypes: Dict[str, np.ndarray] = {}
+        # Eigenface basis (k, size*size) when template_config.pca_components is set
+        self.projection: Optional[np.ndarray] = None
+        self.matcher = TemplateMatcher(config=self.template_config)
+        # Bumped by every full save; update files only apply to the store
+        # generation they were written against
+        self._generation = 0
+        self._saved_projection_rows = 0
+
+        # Serializes every write. A retrain trains outside the lock and merges
+        # under it: people written since its snapshot (_touched revision newer
+        # than the snapshot) keep their current templates, and a clear() during
+        # the retrain discards its results.
+        self._lock = threading.RLock()
+        self._revision = 0
+        self._touched: Dict[str, int] = {}
+        self._cleared_at = 0
 
         os.makedirs(self.faces_db_path, exist_ok=True)
 
     def load(self) -> None:
+        with self._lock:
+            self._load()
 
-        if os.path.exists(self.names_path):
-            try:
-                with open(self.names_path, 'rb') as f:
-                    self.known_faces = pickle.load(f)
-            except Exception as e:
-                print(f"Error loading names mapping: {e}")
-                self.known_faces = {}
-        if os.path.exists(self.templates_path):
-            try:
-                with open(self.templates_path, 'rb') as f:
-                    self.face_templates = pickle.load(f)
-            except Exception as e:
-                print(f"Error loading templates: {e}")
-                self.face_templates = {}
+    def _load(self) -> None:
+        if not os.path.exists(self.store_path):
+            self._migrate_legacy()
+            return
+        try:
+            meta, arrays = read_store(self.store_path, verify=self.verify_store)
+            self._generation = int(meta.get("generation", 0))
+            matrix = arrays["templates"]
+            self.known_faces = dict(meta["known_faces"])
+            # Views into the mapped file; nothing is copied until a template changes
+            self.face_templates = {name: matrix[i] for i, name in enumerate(meta["names"])}
+            self._stored_counts = dict(meta["sample_counts"])
+            self.face_prototypes = {}
+            self.projection = None
+            if self.template_config.pca_components and "projection" in arrays:
+                self.projection = arrays["projection"]
+            if self.template_config.mode != "mean" and "prototypes" in arrays:
+                # Packed rows grouped by person; prototype_labels index meta["names"]
+                labels = np.asarray(arrays["prototype_labels"])
+                bounds = np.searchsorted(labels, np.arange(len(meta["names"]) + 1))
+                for i, name in enumerate(meta["names"]):
+                    if bounds[i + 1] > bounds[i]:
+                        self.face_prototypes[name] = arrays["prototypes"][bounds[i]:bounds[i + 1]]
+            if meta.get("template_mode", "mean") != self.template_config.mode:
+                print(f"Templates were trained in {meta.get('template_mode', 'mean')!r} mode; "
+                      f"retrain to use {self.template_config.mode!r}")
+            size = self.template_config.template_size
+            if matrix.shape[1:] != (size[1], size[0]):
+                # Stored at another canonical size: resample now, retrain for exact templates
+                print(f"Templates are {matrix.shape[2]}x{matrix.shape[1]}; resampling to {size[0]}x{size[1]}")
+                self.face_templates = {name: t for name, t in zip(meta["names"], resize_templates(matrix, size))}
+                self.face_prototypes = {
+                    name: resize_templates(rows, size) for name, rows in self.face_prototypes.items()
+                }
+                self.projection = None
+            self._saved_projection_rows = len(self.projection) if self.projection is not None else 0
+            self._apply_updates()
+        except Exception as e:
+            print(f"Error loading template store: {e}")
+            self.known_faces = {}
+            self.face_templates = {}
+            self.face_prototypes = {}
+            self.projection = None
+            self._stored_counts = {}
+        self.template_sums = {}
+        self.sample_counts = {}
+        self._rebuild_matcher()
+
+    def save(self) -> None:
+        with self._lock:
+            self._save()
 
-    def save_names(self) -> None:
-        with open(self.names_path, 'wb') as f:
-            pickle.dump(self.known_faces, f)
+    def _save(self) -> None:
+        # Write names, templates and counts as one store file, atomically,
+        # in the configured storage precision
+        names = list(self.face_templates.keys())
+        size = self.template_config.template_size
+        dtype = self.template_config.dtype
+        matrix = np.empty((len(names), size[1], size[0]), dtype=np.float32)
+        for i, name in enumerate(names):
+            matrix[i] = self.face_templates[name]
+        matrix = quantize(matrix, dtype)
+        counts = {name: self.sample_counts.get(name, self._stored_counts.get(name, 0)) for name in names}
+        meta = {
+            "known_faces": self.known_faces,
+            "names": names,
+            "sample_counts": counts,
+            "template_mode": self.template_config.mode,
+            "generation": self._generation + 1,
+        }
+        arrays = {"templates": matrix}
 
-    def save_templates(self) -> None:
-        with open(self.templates_path, 'wb') as f:
-            pickle.dump(self.face_templates, f)
+        # Drop views into the old mapping first; Windows can't replace a mapped file
+        self.face_templates = {name: matrix[i] for i, name in enumerate(names)}
+        with_prototypes = [(i, name) for i, name in enumerate(names) if name in self.face_prototypes]
+        if with_prototypes:
+            arrays["prototypes"] = quantize(
+                np.concatenate([np.asarray(self.face_prototypes[name], dtype=np.float32) for _, name in with_prototypes]),
+                dtype,
+            )
+            arrays["prototype_labels"] = np.concatenate(
+                [np.full(len(self.face_prototypes[name]), i, dtype=np.int32) for i, name in with_prototypes]
+            )
+            offset = 0
+            face_prototypes = {}
+            for _, name in with_prototypes:
+                n = len(self.face_prototypes[name])
+                face_prototypes[name] = arrays["prototypes"][offset:offset + n]
+                offset += n
+            self.face_prototypes = face_prototypes
+        if self.projection is not None:
+            self.projection = np.array(self.projection, dtype=np.float32)
+            arrays["projection"] = self.projection
+        write_store(self.store_path, meta, arrays)
+        self._generation += 1
+        self._saved_projection_rows = len(self.projection) if self.projection is not None else 0
+        # Everything is in the store now; updates of the old generation are dead
+        shutil.rmtree(self.updates_path, ignore_errors=True)
+
+    def _save_person(self, name: str) -> None:
+        # Persist one person's change as an update file: O(their templates),
+        # not O(database). Falls back to a full save when there is no store
+        # yet or enough updates have accumulated.
+        updates = self._update_files()
+        if not os.path.exists(self.store_path) or len(updates) >= self.max_updates:
+            self._save()
+            return
+        dtype = self.template_config.dtype
+        meta = {
+            "name": name,
+            "known_faces": {name: self.known_faces[name]},
+            "sample_count": self.sample_counts.get(name, self._stored_counts.get(name, 0)),
+            "generation": self._generation,
+        }
+        arrays = {"template": quantize(np.float32(self.face_templates[name])[None], dtype)}
+        if name in self.face_prototypes:
+            arrays["prototypes"] = quantize(np.asarray(self.face_prototypes[name], dtype=np.float32), dtype)
+        if self.projection is not None and len(self.projection) != self._saved_projection_rows:
+            # The eigenface basis grew for this person (extend_projection)
+            arrays["projection"] = np.asarray(self.projection, dtype=np.float32)
+        os.makedirs(self.updates_path, exist_ok=True)
+        sequence = int(os.path.splitext(os.path.basename(updates[-1]))[0]) + 1 if updates else 0
+        write_store(os.path.join(self.updates_path, f"{sequence:06d}.bin"), meta, arrays)
+        if "projection" in arrays:
+            self._saved_projection_rows = len(self.projection)
+
+    def _update_files(self) -> List[str]:
+        if not os.path.isdir(self.updates_path):
+            return []
+        names = sorted(f for f in os.listdir(self.updates_path) if f.endswith(".bin") and f[:-4].isdigit())
+        return [os.path.join(self.updates_path, f) for f in names]
+
+    def _apply_updates(self) -> None:
+        # Replay update files written since the last full save, oldest first.
+        # They are small, so they are checked in full and copied into memory.
+        size = self.template_config.template_size
+        for path in self._update_files():
+            try:
+                meta, arrays = read_store(path, verify=True)
+                if meta.get("generation") != self._generation:
+                    continue  # left behind by a save that was interrupted
+                name = meta["name"]
+                self.known_faces.update(meta["known_faces"])
+                self.face_templates = {**self.face_templates, name: resize_templates(np.array(arrays["template"], dtype=np.float32), size)[0]}
+                self._stored_counts[name] = meta["sample_count"]
+                if self.template_config.mode != "mean" and "prototypes" in arrays:
+                    self.face_prototypes = {**self.face_prototypes, name: resize_templates(np.array(arrays["prototypes"], dtype=np.float32), size)}
+                if self.template_config.pca_components and "projection" in arrays:
+                    if self.projection is None or arrays["projection"].shape[1] == self.projection.shape[1]:
+                        self.projection = np.array(arrays["projection"])
+                        self._saved_projection_rows = len(self.projection)
+            except (StoreError, KeyError, ValueError, OSError) as e:
+                print(f"Ignoring template update {path}: {e}")
+
+    def _migrate_legacy(self) -> None:
+        # One-time import of names.pkl + face_templates.pkl into the store.
+        # The pickles are left in place but never read again once the store exists.
+        if not os.path.exists(self.legacy_names_path) and not os.path.exists(self.legacy_templates_path):
+            return
+        try:
+            if os.path.exists(self.legacy_names_path):
+                with open(self.legacy_names_path, 'rb') as f:
+                    self.known_faces = pickle.load(f)
+            if os.path.exists(self.legacy_templates_path):
+                with open(self.legacy_templates_path, 'rb') as f:
+                    self.face_templates = {k: np.float32(v) for k, v in pickle.load(f).items()}
+            self.save()
+            print(f"Migrated {len(self.face_templates)} templates to {self.store_path}")
+        except Exception as e:
+            print(f"Error migrating legacy templates: {e}")
+            self.known_faces = {}
+            self.face_templates = {}
+        self._rebuild_matcher()
 
     def save_face_samples(self, name: str, face_samples: List[np.ndarray]) -> None:
+        with self._lock:
+            self._touch(name)
+            self._save_face_samples(name, face_samples)
 
+    def _save_face_samples(self, name: str, face_samples: List[np.ndarray]) -> None:
         person_dir = os.path.join(self.faces_db_path, name)
         os.makedirs(person_dir, exist_ok=True)
 
-        # Save samples as 0.jpg, 1.jpg, ... (overwrite for fresh captures of a new person)
-        for i, face in enumerate(face_samples):
-            cv2.imwrite(os.path.join(person_dir, f"{i}.jpg"), face)
+        is_new = name not in self.known_faces
+        if not is_new:
+            # Capture the running sum before the new files show up in the directory
+            self._ensure_stats(name)
+
+        # Fresh captures of a new person are saved as 0.jpg, 1.jpg, ...;
+        # extra samples of a known person are appended after the last one
+        start = 0 if is_new else _next_sample_index(person_dir)
+        stored_samples = _write_samples(person_dir, start, face_samples)
 
         # Update mapping if new
-        if name not in self.known_faces:
+        if is_new:
             self.known_faces[name] = len(self.known_faces)
 
-        # Retrain after saving
-        self.train_model()
+        # Fold only the new samples into this person's template; this also
+        # persists the names mapping
+        self.add_samples(name, stored_samples)
+        if is_new and not stored_samples:
+            self.save()
 
-        # Persist names mapping
-        self.save_names()
+    def add_people(
+        self,
+        people: Dict[str, List[np.ndarray]],
+        retrain: bool = True,
+        workers: Optional[int] = None,
+        progress: Optional[Callable[[int, int, str], None]] = None,
+    ) -> Dict[str, int]:
+        # Bulk enrollment: write every person's samples to faces_db, then add
+        # the new names to known_faces and persist them together, through one
+        # train_model (retrain) or one plain save. Without retrain, new people
+        # are only recognized after the next retrain. Returns samples written
+        # per person.
+        written: Dict[str, int] = {}
+        with self._lock:
+            new_names: List[str] = []
+            for name, face_samples in people.items():
+                person_dir = os.path.join(self.faces_db_path, name)
+                os.makedirs(person_dir, exist_ok=True)
+                is_new = name not in self.known_faces
+                start = 0 if is_new else _next_sample_index(person_dir)
+                written[name] = len(_write_samples(person_dir, start, face_samples))
+                if is_new and written[name]:
+                    new_names.append(name)
+            for name in new_names:
+                self.known_faces[name] = len(self.known_faces)
+            if not retrain:
+                self._save()
+        if retrain:
+            self.train_model(workers=workers, progress=progress)
+        return written
+
+    def add_samples(self, name: str, face_samples: List[np.ndarray]) -> None:
+        # Incremental training: O(len(face_samples)), no decoding of stored images
+        if not face_samples:
+            return
+        with self._lock:
+            self._touch(name)
+            self._add_samples(name, face_samples)
+
+    def _add_samples(self, name: str, face_samples: List[np.ndarray]) -> None:
+        self._ensure_stats(name)
+        total = self.template_sums[name].copy()
+        size = self.template_config.template_size
+        for face in face_samples:
+            total += _to_size(face, size)
+        count = self.sample_counts[name] + len(face_samples)
+        self._set_person(name, total, count, self._updated_prototypes(name, face_samples))
+        if self.projection is not None:
+            # Make room in the eigenface basis for this person until the next retrain
+            rows = self.face_prototypes.get(name)
+            rows = np.asarray(rows if rows is not None else self.face_templates[name][None], dtype=np.float32)
+            self.projection = extend_projection(self.projection, normalize_rows(rows.reshape(len(rows), -1)))
+        print(f"Updated {name} with {len(face_samples)} new samples ({count} total)")
+        self._update_matcher(name)
+        self._save_person(name)
 
-    def train_model(self) -> None:
+    def train_person(self, name: str) -> None:
+        # Rebuild one person's template from their stored samples only
+        cfg = self.template_config
+        with self._lock:
+            self._touch(name)
+            total, count, prototypes = _train_person_task(
+                os.path.join(self.faces_db_path, name), cfg.mode, cfg.prototypes, cfg.template_size, self.sample_cache
+            )
+            if total is not None:
+                self._set_person(name, total, count, prototypes)
+                self._update_matcher(name)
+                self._save_person(name)
+            else:
+                self._drop_person(name)
+                self._rebuild_matcher()
+                self._save()
+
+    def train_model(
+        self,
+        workers: Optional[int] = None,
+        progress: Optional[Callable[[int, int, str], None]] = None,
+    ) -> None:
+        # Full rebuild: re-decode every sample of every person, one task per
+        # person spread over a process pool. progress(done, total, name) is
+        # called as each person finishes. The old templates stay live until
+        # the new set is swapped in at the end.
 
         print("Starting model training...")
-        self.face_templates = {}
-
-        for name, _ in self.known_faces.items():
-            person_dir = os.path.join(self.faces_db_path, name)
-            if not os.path.exists(person_dir):
-                continue
-
-            person_samples: List[np.ndarray] = []
-            for filename in sorted(os.listdir(person_dir)):
-                if filename.lower().endswith('.jpg'):
-                    img_path = os.path.join(person_dir, filename)
-                    img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-                    if img is not None:
-                        img_resized = cv2.resize(img, (100, 100))
-                        person_samples.append(np.float32(img_resized))
-
-            if person_samples:
-                avg_template = np.mean(person_samples, axis=0)
-                self.face_templates[name] = avg_template
-                print(f"Trained {name} with {len(person_samples)} samples")
-
-        print(f"Training completed. Total people in database: {len(self.face_templates)}")
-        self.save_templates()
+        with self._lock:
+            names = list(self.known_faces.keys())
+            snapshot = self._revision
+        workers = workers if workers is not None else self.train_workers
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(1, min(workers, len(names)))
+
+        mode, k, size = self.template_config.mode, self.template_config.prototypes, self.template_config.template_size
+        results: Dict[str, Tuple[Optional[np.ndarray], int, Optional[np.ndarray]]] = {}
+        if workers == 1:
+            for done, name in enumerate(names, 1):
+                results[name] = _train_person_task(os.path.join(self.faces_db_path, name), mode, k, size, self.sample_cache)
+                if progress:
+                    progress(done, len(names), name)
+        else:
+            # spawn, not fork: the GUI process has live camera and Tk threads
+            ctx = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+                futures = {
+                    pool.submit(
+                        _train_person_task, os.path.join(self.faces_db_path, name), mode, k, size, self.sample_cache
+                    ): name
+                    for name in names
+                }
+                for done, future in enumerate(as_completed(futures), 1):
+                    name = futures[future]
+                    results[name] = future.result()
+                    if progress:
+                        progress(done, len(names), name)
+
+        face_templates: Dict[str, np.ndarray] = {}
+        template_sums: Dict[str, np.ndarray] = {}
+        sample_counts: Dict[str, int] = {}
+        face_prototypes: Dict[str, np.ndarray] = {}
+        for name in names:
+            total, count, prototypes = results[name]
+            if total is not None:
+                template_sums[name] = total
+                sample_counts[name] = count
+                face_templates[name] = total / count
+                if prototypes is not None:
+                    face_prototypes[name] = prototypes
+                print(f"Trained {name} with {count} samples")
+
+        with self._lock:
+            if self._cleared_at > snapshot:
+                print("Database was cleared during training; discarding the retrained templates")
+                return
+            # People added or updated while training keep their current templates
+            for name, revision in self._touched.items():
+                if revision <= snapshot:
+                    continue
+                for current, trained in (
+                    (self.face_templates, face_templates),
+                    (self.template_sums, template_sums),
+                    (self.sample_counts, sample_counts),
+                    (self.face_prototypes, face_prototypes),
+                ):
+                    if name in current:
+                        trained[name] = current[name]
+                    else:
+                        trained.pop(name, None)
+
+            self.face_templates = face_templates
+            self.face_prototypes = face_prototypes
+            # Relearn the eigenface basis from the new templates
+            self.projection = None
+            self.template_sums = template_sums
+            self.sample_counts = sample_counts
+            print(f"Training completed. Total people in database: {len(self.face_templates)}")
+            self._rebuild_matcher()
+            self._save()
 
     def clear(self) -> None:
+        with self._lock:
+            self._revision += 1
+            self._cleared_at = self._revision
+            self._touched = {}
+            self._clear()
 
+    def _clear(self) -> None:
         try:
             if os.path.exists(self.faces_db_path):
-                import shutil
                 shutil.rmtree(self.faces_db_path)
             os.makedirs(self.faces_db_path, exist_ok=True)
+            shutil.rmtree(self.updates_path, ignore_errors=True)
 
-            if os.path.exists(self.templates_path):
-                os.remove(self.templates_path)
-            if os.path.exists(self.names_path):
-                os.remove(self.names_path)
+            for path in (self.store_path, self.legacy_templates_path, self.legacy_names_path):
+                if os.path.exists(path):
+                    os.remove(path)
         finally:
             self.known_faces = {}
             self.face_templates = {}
+            self.face_prototypes = {}
+            self.projection = None
+            self.template_sums = {}
+            self.sample_counts = {}
+            self._stored_counts = {}
+            self._rebuild_matcher()
+
+    def _touch(self, name: str) -> None:
+        self._revision += 1
+        self._touched[name] = self._revision
+
+    def _ensure_stats(self, name: str) -> None:
+        # Recover a person's running sum from their stored template and
+        # sample count, without decoding any image
+        if name in self.template_sums:
+            return
+        template = self.face_templates.get(name)
+        if template is None:
+            size = self.template_config.template_size
+            self.template_sums[name] = np.zeros((size[1], size[0]), dtype=np.float32)
+            self.sample_counts[name] = 0
+            return
+        count = self._stored_counts.get(name) or len(_sample_files(os.path.join(self.faces_db_path, name)))
+        count = max(1, count)
+        self.template_sums[name] = np.float32(template) * count
+        self.sample_counts[name] = count
+
+    def _updated_prototypes(self, name: str, face_samples: List[np.ndarray]) -> Optional[np.ndarray]:
+        mode, size = self.template_config.mode, self.template_config.template_size
+        if mode == "mean":
+            return None
+        person_dir = os.path.join(self.faces_db_path, name)
+        new_rows = [_to_size(face, size) for face in face_samples]
+        if mode == "all":
+            existing = self.face_prototypes.get(name)
+            if existing is not None:
+                return np.concatenate([np.asarray(existing, dtype=np.float32), np.stack(new_rows)])
+            # No prototypes yet (e.g. trained in "mean" mode): start from all stored samples
+            return build_prototypes(load_person_samples(person_dir, size, self.sample_cache) or new_rows, mode, 0)
+        # k-means prototypes can't be updated in place; re-cluster this
+        # person's stored samples (save_face_samples has written the new ones)
+        samples = load_person_samples(person_dir, size, self.sample_cache) or new_rows
+        return build_prototypes(samples, mode, self.template_config.prototypes)
+
+    def _set_person(self, name: str, total: np.ndarray, count: int, prototypes: Optional[np.ndarray] = None) -> None:
+        self.template_sums[name] = total
+        self.sample_counts[name] = count
+        # Copy-on-write so threads holding the old dicts never see them mutate
+        self.face_templates = {**self.face_templates, name: total / count}
+        if prototypes is not None:
+            self.face_prototypes = {**self.face_prototypes, name: prototypes}
+
+    def _drop_person(self, name: str) -> None:
+        self.template_sums.pop(name, None)
+        self.sample_counts.pop(name, None)
+        self.face_templates = {k: v for k, v in self.face_templates.items() if k != name}
+        self.face_prototypes = {k: v for k, v in self.face_prototypes.items() if k != name}
+
+    def _update_matcher(self, name: str) -> None:
+        # Patch one person's rows into the live matcher without rebuilding it
+        # or re-clustering its index; train_model rebuilds everything
+        matcher = self.matcher.with_person(
+            name, self.face_templates[name], self.face_prototypes.get(name), self.projection
+        )
+        self.projection = matcher.projection
+        self.matcher = matcher
+
+    def _rebuild_matcher(self) -> None:
+        # Swap in a new matcher in one assignment so readers never see a partial one
+        matcher = TemplateMatcher(self.face_templates, self.face_prototypes, self.template_config, self.projection)
+        self.projection = matcher.projection
+        self.matcher = matcher
 
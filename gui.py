@@ -17,7 +17,10 @@ class AppUI:
         on_clear_db: Callable[[], None],
         on_export_attendance: Callable[[], None],
         on_threshold_change: Callable[[str], None],
+        on_auto_checkin_toggle: Callable[[bool], None],
+        on_stop_enrollment: Callable[[], None],
         initial_threshold: float,
+        initial_auto_checkin: bool = False,
     ) -> None:
         self.root = root
         self.on_confirm = on_confirm
@@ -28,15 +31,24 @@ class AppUI:
         self.on_clear_db = on_clear_db
         self.on_export_attendance = on_export_attendance
         self.on_threshold_change = on_threshold_change
+        self.on_auto_checkin_toggle = on_auto_checkin_toggle
+        self.on_stop_enrollment = on_stop_enrollment
 
         # Widget refs
         self.camera_label: Optional[tk.Label] = None
         self.status_label: Optional[tk.Label] = None
         self.result_label: Optional[tk.Label] = None
+        self.stats_label: Optional[tk.Label] = None
         self.confirm_button: Optional[tk.Button] = None
         self.reject_button: Optional[tk.Button] = None
+        self.stop_enrollment_button: Optional[tk.Button] = None
 
-        self._build(initial_threshold)
+        # Last values pushed to the labels; unchanged updates are skipped
+        self._status_text: Optional[str] = None
+        self._result_state: Optional[tuple] = None
+        self._stats_text: Optional[str] = None
+
+        self._build(initial_threshold, initial_auto_checkin)
 
     def update_camera_display(self, frame_tk) -> None:
         if self.camera_label is not None:
@@ -44,10 +56,20 @@ class AppUI:
             self.camera_label.image = frame_tk
 
     def update_status(self, text: str) -> None:
-        if self.status_label is not None:
+        if self.status_label is not None and text != self._status_text:
+            self._status_text = text
             self.status_label.configure(text=text)
 
+    def update_pipeline_stats(self, text: str) -> None:
+        if self.stats_label is not None and text != self._stats_text:
+            self._stats_text = text
+            self.stats_label.configure(text=text)
+
     def update_result(self, text: str, show_buttons: bool, has_detection: bool) -> None:
+        state = (text, show_buttons and has_detection)
+        if state == self._result_state:
+            return
+        self._result_state = state
         if self.result_label is not None:
             self.result_label.configure(text=text)
         if self.confirm_button and self.reject_button:
@@ -59,11 +81,23 @@ class AppUI:
                 self.reject_button.pack_forget()
 
     def hide_confirm_buttons(self) -> None:
+        if self._result_state is not None:
+            self._result_state = (self._result_state[0], False)
         if self.confirm_button and self.reject_button:
             self.confirm_button.pack_forget()
             self.reject_button.pack_forget()
 
-    def _build(self, initial_threshold: float) -> None:
+    def set_enrolling(self, enrolling: bool) -> None:
+        # Enrollment runs inside the live view; only a stop button is added
+        if self.stop_enrollment_button is None:
+            return
+        if enrolling:
+            self.hide_confirm_buttons()
+            self.stop_enrollment_button.pack(pady=5)
+        else:
+            self.stop_enrollment_button.pack_forget()
+
+    def _build(self, initial_threshold: float, initial_auto_checkin: bool) -> None:
         self.root.geometry("1200x900")
         self.root.title("FaceAttend - Facial Recognition System")
         self.root.configure(bg="#f0f0f0")
@@ -90,6 +124,16 @@ class AppUI:
         self.camera_label = tk.Label(camera_frame, bg="#34495e", width=640, height=480)
         self.camera_label.pack(padx=10, pady=10)
 
+        self.stats_label = tk.Label(
+            camera_frame,
+            text="",
+            font=("Arial", 8),
+            bg="#34495e",
+            fg="#bdc3c7",
+            wraplength=640,
+        )
+        self.stats_label.pack(padx=10, pady=(0, 5))
+
         control_frame = tk.Frame(content_frame, bg="#f0f0f0", width=350)
         control_frame.pack(side=tk.RIGHT, fill=tk.Y)
         control_frame.pack_propagate(False)
@@ -159,9 +203,20 @@ class AppUI:
             width=18,
             height=2,
         )
-        # Initially hidden; update_result will manage visibility
+        self.stop_enrollment_button = tk.Button(
+            confirm_frame,
+            text="Stop Enrollment",
+            font=("Arial", 11),
+            bg="#e67e22",
+            fg="white",
+            command=self.on_stop_enrollment,
+            width=18,
+            height=1,
+        )
+        # Initially hidden; update_result and set_enrolling manage visibility
         self.confirm_button.pack_forget()
         self.reject_button.pack_forget()
+        self.stop_enrollment_button.pack_forget()
 
         db_frame = tk.LabelFrame(
             control_frame,
@@ -266,3 +321,13 @@ class AppUI:
 
         tk.Label(settings_frame, text="Lower = More Strict", font=("Arial", 8), bg="#f0f0f0", fg="#7f8c8d").pack()
 
+        auto_checkin_var = tk.BooleanVar(value=initial_auto_checkin)
+        tk.Checkbutton(
+            settings_frame,
+            text="Auto check-in (no confirmation)",
+            variable=auto_checkin_var,
+            command=lambda: self.on_auto_checkin_toggle(auto_checkin_var.get()),
+            font=("Arial", 10),
+            bg="#f0f0f0",
+        ).pack(pady=(5, 0))
+
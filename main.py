@@ -1,6 +1,14 @@
+import logging
+import os
+
 from app import FaceRecognitionApp
 
 
 if __name__ == "__main__":
+    # FACEATTEND_LOG_LEVEL=DEBUG prints every per-template comparison
+    logging.basicConfig(
+        level=os.environ.get("FACEATTEND_LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
     app = FaceRecognitionApp()
     app.start()
\ No newline at end of file
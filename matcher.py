@@ -0,0 +1,494 @@
+import copy
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from config import dataclass_from_dict
+
+
+TEMPLATE_SIZE = (100, 100)
+
+TEMPLATE_MODES = ("mean", "all", "kmeans")
+AGGREGATES = ("max", "topk")
+STORAGE_DTYPES = ("float32", "float16", "uint8")
+
+
+@dataclass
+class TemplateConfig:
+    # How many templates each person keeps and how their scores combine
+    mode: str = "mean"  # "mean" = one averaged template, "all" = every sample, "kmeans" = prototypes
+    prototypes: int = 5  # k-means prototypes per person
+    aggregate: str = "max"  # per-person score: best row, or "topk" = mean of the top_k best rows
+    top_k: int = 3
+    index_min_rows: int = 2048  # build the IVF index once the packed matrix has this many rows
+    index_lists: int = 0  # coarse lists; 0 = about sqrt(rows)
+    nprobe: int = 8  # lists scanned per query
+    # Compact representation: canonical side length, stored precision and an
+    # optional projection onto pca_components eigenfaces learned at train time
+    size: int = 100
+    dtype: str = "float32"
+    pca_components: int = 0
+    # Alignment-tolerant rescoring of the best candidates: search offsets up
+    # to align_radius x size in each direction and the given scales (0 = off)
+    align_radius: float = 0.0
+    align_scales: Tuple[float, ...] = (0.9, 1.0, 1.1)
+    align_candidates: int = 8  # people rescored per face
+    align_cache: int = 512  # template spectra kept between frames, about 58 KB each at size 100
+
+    def __post_init__(self) -> None:
+        if self.mode not in TEMPLATE_MODES:
+            raise ValueError(f"template mode must be one of {TEMPLATE_MODES}, got {self.mode!r}")
+        if self.aggregate not in AGGREGATES:
+            raise ValueError(f"aggregate must be one of {AGGREGATES}, got {self.aggregate!r}")
+        if self.dtype not in STORAGE_DTYPES:
+            raise ValueError(f"dtype must be one of {STORAGE_DTYPES}, got {self.dtype!r}")
+
+    @property
+    def template_size(self) -> Tuple[int, int]:
+        return (self.size, self.size)
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "TemplateConfig":
+        return dataclass_from_dict(cls, values, "template", ("align_scales",))
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    # Mean-centre and unit-normalize each row, so a dot product of two rows
+    # equals cv2.TM_CCOEFF_NORMED of the equally sized images they came from
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centred = vectors - vectors.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(centred, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(centred / norms, dtype=np.float32)
+
+
+def quantize(templates: np.ndarray, dtype: str) -> np.ndarray:
+    # Pixel-domain templates (0-255) in their stored precision
+    if dtype == "uint8":
+        return np.clip(np.rint(templates), 0, 255).astype(np.uint8)
+    return np.asarray(templates, dtype=dtype)
+
+
+def resize_templates(templates: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    # (n, h, w) templates resized to size; untouched if they already match
+    templates = np.asarray(templates, dtype=np.float32)
+    if templates.shape[1:] == (size[1], size[0]):
+        return templates
+    return np.stack([cv2.resize(t, size, interpolation=cv2.INTER_AREA) for t in templates])
+
+
+def learn_projection(rows: np.ndarray, components: int, max_rows: int = 4096) -> np.ndarray:
+    # (k, D) orthonormal basis of the top principal directions of the
+    # normalized rows. Uncentred on purpose: for rows inside the span,
+    # (B t).(B q) == t.q exactly, so projected scores keep their meaning.
+    if len(rows) > max_rows:
+        rows = rows[np.random.default_rng(0).choice(len(rows), max_rows, replace=False)]
+    _, singular, vt = np.linalg.svd(rows, full_matrices=False)
+    keep = min(components, int(np.sum(singular > 1e-6 * max(singular[0], 1e-12))))
+    return np.ascontiguousarray(vt[:max(1, keep)], dtype=np.float32)
+
+
+def extend_projection(basis: np.ndarray, rows: np.ndarray, tolerance: float = 0.05) -> np.ndarray:
+    # Add the directions of normalized rows the basis can't represent (residual
+    # norm above tolerance), e.g. a person enrolled since the last retrain
+    residual = rows - (rows @ basis.T) @ basis
+    novel = residual[np.linalg.norm(residual, axis=1) > tolerance]
+    if len(novel) == 0:
+        return basis
+    q, _ = np.linalg.qr(novel.T)
+    extra = q.T - (q.T @ basis.T) @ basis
+    norms = np.linalg.norm(extra, axis=1, keepdims=True)
+    extra = extra[norms[:, 0] > 1e-3] / norms[norms[:, 0] > 1e-3]
+    return np.ascontiguousarray(np.concatenate([basis, extra]), dtype=np.float32)
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    # (centers, labels) of vectors (N, D); deterministic for a given seed
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    k = max(1, min(k, len(vectors)))
+    cv2.setRNGSeed(seed)
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, iterations, 1e-4)
+    _, labels, centers = cv2.kmeans(vectors, k, None, criteria, 1, cv2.KMEANS_PP_CENTERS)
+    return centers, labels.ravel()
+
+
+def aggregate_scores(
+    scores: np.ndarray, labels: np.ndarray, count: int, aggregate: str = "max", top_k: int = 3
+) -> np.ndarray:
+    # Combine per-row scores into per-person scores (labels = person index of
+    # each row). People with no rows in scores get -1, the lowest correlation.
+    out = np.full(count, -1.0, dtype=np.float32)
+    if len(scores) == 0:
+        return out
+    if aggregate == "max" or top_k <= 1:
+        best = np.full(count, -np.inf, dtype=np.float32)
+        np.maximum.at(best, labels, scores)
+        seen = np.isfinite(best)
+        out[seen] = best[seen]
+        return out
+    # Sort by (person, score descending) and keep each person's first top_k rows
+    order = np.lexsort((-scores, labels))
+    sorted_labels = labels[order]
+    group_start = np.r_[0, np.flatnonzero(sorted_labels[1:] != sorted_labels[:-1]) + 1]
+    ranks = np.arange(len(order)) - np.repeat(group_start, np.diff(np.r_[group_start, len(order)]))
+    keep = ranks < top_k
+    sums = np.bincount(sorted_labels[keep], weights=scores[order][keep], minlength=count)
+    counts = np.bincount(sorted_labels[keep], minlength=count)
+    seen = counts > 0
+    out[seen] = sums[seen] / counts[seen]
+    return out
+
+
+class IVFIndex:
+    # Inverted-file index over the packed rows: a coarse k-means splits them
+    # into lists, and a query only scores the rows of its nprobe nearest
+    # lists. Rows are reordered so each list is one contiguous slice.
+
+    def __init__(self, matrix: np.ndarray, n_lists: int = 0, nprobe: int = 8, seed: int = 0) -> None:
+        rows = len(matrix)
+        n_lists = n_lists or int(np.sqrt(rows))
+        n_lists = max(1, min(n_lists, rows))
+        # Training on a sample keeps the build time flat as the database grows
+        rng = np.random.default_rng(seed)
+        sample = matrix if rows <= 64 * n_lists else matrix[np.sort(rng.choice(rows, 64 * n_lists, replace=False))]
+        centers, _ = kmeans(sample, n_lists, iterations=10, seed=seed)
+        self.centroids = normalize_rows(centers)
+        self.nprobe = max(1, min(nprobe, len(self.centroids)))
+
+        self._set_assignment(self.assign(matrix))
+
+    def assign(self, matrix: np.ndarray) -> np.ndarray:
+        # Nearest list of each row
+        assignment = np.empty(len(matrix), dtype=np.int64)
+        for start in range(0, len(matrix), 4096):
+            assignment[start:start + 4096] = np.argmax(matrix[start:start + 4096] @ self.centroids.T, axis=1)
+        return assignment
+
+    def assignment(self) -> np.ndarray:
+        # List of each row of the reordered matrix
+        return np.repeat(np.arange(len(self.centroids)), np.diff(self.offsets))
+
+    def extended(self, assignment: np.ndarray, rows: np.ndarray) -> "IVFIndex":
+        # Same centroids over rows already in lists (assignment) followed by
+        # new rows, which join their nearest list. Centroids are zero-padded
+        # when the rows have gained dimensions (a grown eigenface basis).
+        index = copy.copy(self)
+        if rows.shape[1] > self.centroids.shape[1]:
+            index.centroids = np.pad(self.centroids, ((0, 0), (0, rows.shape[1] - self.centroids.shape[1])))
+        index._set_assignment(np.concatenate([assignment, index.assign(rows)]))
+        return index
+
+    def _set_assignment(self, assignment: np.ndarray) -> None:
+        self.order = np.argsort(assignment, kind="stable")
+        self.offsets = np.searchsorted(assignment[self.order], np.arange(len(self.centroids) + 1))
+
+    def probe(self, queries: np.ndarray) -> np.ndarray:
+        # (B, nprobe) nearest list ids per query
+        coarse = queries @ self.centroids.T
+        if self.nprobe >= coarse.shape[1]:
+            return np.tile(np.arange(coarse.shape[1]), (len(queries), 1))
+        return np.argpartition(-coarse, self.nprobe - 1, axis=1)[:, :self.nprobe]
+
+
+class AlignedScorer:
+    # Alignment-tolerant scoring: the probe is cropped around the Haar box
+    # with a margin, and each template slides over every offset within the
+    # radius at each scale, keeping its best TM_CCOEFF_NORMED. All offsets
+    # of a template come from one FFT product, window norms from one
+    # integral image, so the cost grows with templates and scales but not
+    # with the number of offsets.
+
+    def __init__(
+        self,
+        rows: np.ndarray,
+        size: Tuple[int, int],
+        radius: float,
+        scales: Sequence[float],
+        max_spectra: int = 512,
+    ) -> None:
+        self.rows = rows  # (M, w*h) normalized pixel rows
+        self.size = size
+        self.radius = max(1, int(round(radius * size[0])))
+        self.scales = tuple(scales) or (1.0,)
+        self.shape = (size[1] + 2 * self.radius, size[0] + 2 * self.radius)  # probe (h, w)
+        # Any FFT size >= the probe keeps the searched offsets free of wrap-around
+        self.fft_shape = (cv2.getOptimalDFTSize(self.shape[0]), cv2.getOptimalDFTSize(self.shape[1]))
+        # Least recently used spectra are dropped once max_spectra are cached;
+        # the same few candidates tend to come back frame after frame
+        self.max_spectra = max(1, max_spectra)
+        self._spectra: "OrderedDict[int, np.ndarray]" = OrderedDict()
+
+    def probes(self, gray: np.ndarray, box: Tuple[int, int, int, int]) -> List[np.ndarray]:
+        # One (h + 2r, w + 2r) probe per scale, all the same size so the
+        # template spectra are shared; pixels outside the frame are replicated
+        x, y, w, h = box
+        center = (x + w / 2.0, y + h / 2.0)
+        probe_h, probe_w = self.shape
+        probes = []
+        for scale in self.scales:
+            crop = (
+                max(1, int(round(w * scale * probe_w / self.size[0]))),
+                max(1, int(round(h * scale * probe_h / self.size[1]))),
+            )
+            patch = cv2.getRectSubPix(gray, crop, center)
+            probes.append(np.float32(cv2.resize(patch, (probe_w, probe_h))))
+        return probes
+
+    def best_scores(self, probes: Sequence[np.ndarray], rows: np.ndarray) -> np.ndarray:
+        # Best score of each row in rows over all offsets and scales
+        template_h, template_w = self.size[1], self.size[0]
+        span = 2 * self.radius + 1
+        n = template_h * template_w
+        bank = np.stack([self._spectrum(int(i)) for i in rows])
+        best = np.full(len(rows), -1.0, dtype=np.float32)
+        for probe in probes:
+            spectrum = np.fft.rfft2(probe, s=self.fft_shape)
+            corr = np.fft.irfft2(spectrum[None] * bank, s=self.fft_shape)[:, :span, :span]
+            sums, squares = cv2.integral2(probe, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+            window_sum = _window_sums(sums, template_h, template_w, span)
+            window_sq = _window_sums(squares, template_h, template_w, span)
+            norms = np.sqrt(np.maximum(window_sq - window_sum ** 2 / n, 1e-6))
+            best = np.maximum(best, (corr / norms[None]).reshape(len(rows), -1).max(axis=1))
+        return best
+
+    def _spectrum(self, row: int) -> np.ndarray:
+        # Conjugate spectrum of one zero-padded template, computed on first use
+        spectrum = self._spectra.get(row)
+        if spectrum is not None:
+            self._spectra.move_to_end(row)
+            return spectrum
+        template = self.rows[row].reshape(self.size[1], self.size[0])
+        spectrum = np.conj(np.fft.rfft2(template, s=self.fft_shape)).astype(np.complex64)
+        self._spectra[row] = spectrum
+        if len(self._spectra) > self.max_spectra:
+            self._spectra.popitem(last=False)
+        return spectrum
+
+
+def _window_sums(integral: np.ndarray, h: int, w: int, span: int) -> np.ndarray:
+    # Sums of every h x w window with its top-left corner in [0, span)^2
+    return integral[h:h + span, w:w + span] - integral[:span, w:w + span] - integral[h:h + span, :span] + integral[:span, :span]
+
+
+class TemplateMatcher:
+    # Scores face ROIs against every template with one matrix-vector product.
+    # A person may own several rows (prototypes); their rows are packed into
+    # one matrix with a row -> person label and scores are aggregated per person.
+    # With config.pca_components, rows and probes are projected onto a small
+    # eigenface basis, so each comparison touches a few hundred numbers.
+
+    def __init__(
+        self,
+        templates: Optional[Dict[str, np.ndarray]] = None,
+        prototypes: Optional[Dict[str, np.ndarray]] = None,
+        config: Optional[TemplateConfig] = None,
+        projection: Optional[np.ndarray] = None,
+    ) -> None:
+        # templates: name -> (size, size) mean template. prototypes: name -> (k, size, size);
+        # a person with prototypes is matched on those instead of the mean.
+        # projection: basis from an earlier build; learned from the rows when missing.
+        self.config = config or TemplateConfig()
+        self.size = self.config.template_size
+        self.projection: Optional[np.ndarray] = None
+        self.names: List[str] = []
+        self.matrix = np.empty((0, self.size[0] * self.size[1]), dtype=np.float32)
+        self.labels = np.empty(0, dtype=np.int64)
+        self.index: Optional[IVFIndex] = None
+        self.aligner: Optional[AlignedScorer] = None
+        if templates:
+            self.names = list(templates.keys())
+            prototypes = prototypes or {}
+            blocks, labels = [], []
+            for i, name in enumerate(self.names):
+                rows = prototypes.get(name)
+                if rows is None or len(rows) == 0:
+                    rows = np.asarray(templates[name])[None]
+                rows = resize_templates(rows, self.size)
+                blocks.append(rows.reshape(len(rows), -1))
+                labels.append(np.full(len(rows), i, dtype=np.int64))
+            self.matrix = normalize_rows(np.concatenate(blocks))
+            self.labels = np.concatenate(labels)
+            pixel_rows = self.matrix
+            if self.config.pca_components > 0:
+                if projection is None or projection.shape[1] != self.matrix.shape[1]:
+                    projection = learn_projection(self.matrix, self.config.pca_components)
+                self.projection = np.asarray(projection, dtype=np.float32)
+                self.matrix = np.ascontiguousarray(self.matrix @ projection.T)
+            if len(self.matrix) >= self.config.index_min_rows:
+                self.index = IVFIndex(self.matrix, self.config.index_lists, self.config.nprobe)
+                self.matrix = np.ascontiguousarray(self.matrix[self.index.order])
+                self.labels = self.labels[self.index.order]
+                pixel_rows = pixel_rows[self.index.order]
+            if self.config.align_radius > 0:
+                self.aligner = AlignedScorer(
+                    pixel_rows, self.size, self.config.align_radius, self.config.align_scales, self.config.align_cache
+                )
+        # One row per person in name order: row scores already are person scores
+        self._one_per_person = len(self.labels) == len(self.names) and self.index is None
+
+    def with_person(
+        self,
+        name: str,
+        template: np.ndarray,
+        prototypes: Optional[np.ndarray] = None,
+        projection: Optional[np.ndarray] = None,
+    ) -> "TemplateMatcher":
+        # Copy of this matcher with one person's rows added or replaced, for
+        # incremental enrollment. Everyone else's rows, the eigenface basis and
+        # the index centroids are reused; the new rows only go to their nearest
+        # list, so nothing is re-clustered. projection is this matcher's basis,
+        # possibly grown by extend_projection: older rows keep zeros on the
+        # new directions, i.e. the scores they had. No index is created here;
+        # the next full build (train_model) adds one once it pays off.
+        rows = prototypes if prototypes is not None and len(prototypes) > 0 else np.asarray(template)[None]
+        rows = resize_templates(rows, self.size)
+        pixel_rows = normalize_rows(rows.reshape(len(rows), -1))
+
+        basis = self.projection
+        if self.config.pca_components > 0:
+            if projection is not None:
+                basis = np.asarray(projection, dtype=np.float32)
+            elif basis is None:
+                basis = learn_projection(pixel_rows, self.config.pca_components)
+        matrix = self.matrix
+        new_rows = pixel_rows
+        if basis is not None:
+            if matrix.shape[1] != basis.shape[0]:
+                matrix = (
+                    np.pad(matrix, ((0, 0), (0, basis.shape[0] - matrix.shape[1])))
+                    if len(matrix) else np.empty((0, basis.shape[0]), dtype=np.float32)
+                )
+            new_rows = pixel_rows @ basis.T
+
+        updated = copy.copy(self)
+        updated.projection = basis
+        if name in self.names:
+            person = self.names.index(name)
+        else:
+            person = len(self.names)
+            updated.names = self.names + [name]
+        keep = self.labels != person
+        labels = np.concatenate([self.labels[keep], np.full(len(new_rows), person, dtype=np.int64)])
+        matrix = np.concatenate([matrix[keep], new_rows])
+        aligned_rows = None
+        if self.config.align_radius > 0:
+            aligned_rows = np.concatenate([self.aligner.rows[keep], pixel_rows]) if self.aligner is not None else pixel_rows
+        if self.index is not None:
+            updated.index = self.index.extended(self.index.assignment()[keep], new_rows)
+            matrix, labels = matrix[updated.index.order], labels[updated.index.order]
+            if aligned_rows is not None:
+                aligned_rows = aligned_rows[updated.index.order]
+        updated.matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        updated.labels = labels
+        if aligned_rows is not None:
+            updated.aligner = AlignedScorer(
+                aligned_rows, self.size, self.config.align_radius, self.config.align_scales, self.config.align_cache
+            )
+        updated._one_per_person = updated.index is None and np.array_equal(labels, np.arange(len(updated.names)))
+        return updated
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def rows(self) -> int:
+        return len(self.matrix)
+
+    def prepare(self, face_roi: np.ndarray) -> np.ndarray:
+        # Resize a grayscale ROI to template size and normalize (and project) it like a template row
+        return self.prepare_batch([face_roi])[0]
+
+    def prepare_batch(self, face_rois: Sequence[np.ndarray]) -> np.ndarray:
+        # Resize every ROI into one (B, h, w) array and normalize it as (B, h*w) rows
+        batch = np.empty((len(face_rois), self.size[1], self.size[0]), dtype=np.float32)
+        for i, face_roi in enumerate(face_rois):
+            if face_roi.shape[:2] != (self.size[1], self.size[0]):
+                face_roi = cv2.resize(face_roi, self.size)
+            batch[i] = face_roi
+        rows = normalize_rows(batch.reshape(len(face_rois), -1))
+        if self.projection is not None:
+            rows = rows @ self.projection.T
+        return rows
+
+    def score(self, face_roi: np.ndarray) -> np.ndarray:
+        # TM_CCOEFF_NORMED score of the ROI against every person, in self.names order
+        return self._aggregate(self.matrix @ self.prepare(face_roi))
+
+    def match(self, face_roi: np.ndarray, top_k: int = 1) -> List[Tuple[str, float]]:
+        # Best top_k (name, score) pairs, highest score first
+        if not self.names:
+            return []
+        return self.match_batch([face_roi], top_k)[0]
+
+    def score_batch(self, face_rois: Sequence[np.ndarray]) -> np.ndarray:
+        # (B, N) exact scores of every ROI against every person with one matrix-matrix product
+        if len(face_rois) == 0:
+            return np.empty((0, len(self.names)), dtype=np.float32)
+        row_scores = self.prepare_batch(face_rois) @ self.matrix.T
+        if self._one_per_person:
+            return row_scores
+        return np.stack([self._aggregate(row) for row in row_scores])
+
+    def match_batch(self, face_rois: Sequence[np.ndarray], top_k: int = 1) -> List[List[Tuple[str, float]]]:
+        # Per-face top_k (name, score) lists, in the same order as face_rois.
+        # ROIs may come from one frame or from a window of several frames.
+        # With an index the search is approximate: only the probed lists are scored.
+        if not self.names:
+            return [[] for _ in face_rois]
+        if self.index is None or len(face_rois) == 0:
+            scores = self.score_batch(face_rois)
+            return [self._top_k(row, top_k) for row in scores]
+
+        queries = self.prepare_batch(face_rois)
+        results = []
+        for query, lists in zip(queries, self.index.probe(queries)):
+            offsets = self.index.offsets
+            rows = np.concatenate([np.arange(offsets[l], offsets[l + 1]) for l in lists])
+            row_scores = np.concatenate([self.matrix[offsets[l]:offsets[l + 1]] @ query for l in lists])
+            scores = aggregate_scores(row_scores, self.labels[rows], len(self.names), self.config.aggregate, self.config.top_k)
+            results.append(self._top_k(scores, top_k))
+        return results
+
+    def match_boxes(
+        self, gray: np.ndarray, boxes: Sequence[Tuple[int, int, int, int]], top_k: int = 1
+    ) -> List[List[Tuple[str, float]]]:
+        # match_batch on the boxes' crops of a grayscale frame. With
+        # config.align_radius, each face's align_candidates best people are
+        # rescored over nearby offsets and scales and keep the better score.
+        rois = [gray[y:y + h, x:x + w] for (x, y, w, h) in boxes]
+        if self.aligner is None or not self.names:
+            return self.match_batch(rois, top_k)
+
+        name_index = {name: i for i, name in enumerate(self.names)}
+        results = []
+        for box, candidates in zip(boxes, self.match_batch(rois, max(top_k, self.config.align_candidates))):
+            people = [name_index[name] for name, _ in candidates]
+            rows = np.flatnonzero(np.isin(self.labels, people))
+            aligned = aggregate_scores(
+                self.aligner.best_scores(self.aligner.probes(gray, box), rows),
+                self.labels[rows],
+                len(self.names),
+                self.config.aggregate,
+                self.config.top_k,
+            )
+            rescored = [(name, max(score, float(aligned[name_index[name]]))) for name, score in candidates]
+            rescored.sort(key=lambda c: -c[1])
+            results.append(rescored[:top_k])
+        return results
+
+    def _aggregate(self, row_scores: np.ndarray) -> np.ndarray:
+        if self._one_per_person:
+            return row_scores
+        return aggregate_scores(row_scores, self.labels, len(self.names), self.config.aggregate, self.config.top_k)
+
+    def _top_k(self, scores: np.ndarray, top_k: int) -> List[Tuple[str, float]]:
+        k = min(max(top_k, 1), len(scores))
+        if k < len(scores):
+            idx = np.argpartition(-scores, k - 1)[:k]
+        else:
+            idx = np.arange(len(scores))
+        idx = idx[np.argsort(-scores[idx], kind="stable")]
+        return [(self.names[i], float(scores[i])) for i in idx]
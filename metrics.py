@@ -0,0 +1,294 @@
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+SCORE_BUCKETS = (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+
+
+class Histogram:
+    # Fixed-bucket histogram; counts[i] holds values <= buckets[i], the last slot the overflow
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def snapshot(self) -> Dict:
+        return {
+            "buckets": self.buckets,
+            "counts": list(self.counts),
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+        }
+
+
+class Metrics:
+    # Thread-safe registry of counters, gauges and histograms
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {}
+        self.gauges: Dict[str, float] = {}
+        self.histograms: Dict[str, Histogram] = {}
+        self.started = time.time()
+
+    def inc(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        self.gauges[name] = value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram(buckets)
+            hist.observe(value)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        # Records the block's wall time, in seconds, into the `name` histogram
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "timestamp": time.time(),
+                "uptime_s": time.time() - self.started,
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {name: h.snapshot() for name, h in self.histograms.items()},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            self.started = time.time()
+
+
+# Process-wide registry used by the pipeline, engine and app
+METRICS = Metrics()
+
+
+class StartupTimer:
+    # Startup report: milestones are seconds since this module was imported
+    # (the first thing main.py does), stages are the durations of individual
+    # loading steps, which may overlap. Both also go to METRICS as
+    # startup.<name>.seconds gauges.
+
+    def __init__(self, metrics: Metrics = METRICS) -> None:
+        self.metrics = metrics
+        self.started = time.perf_counter()
+        self.milestones: List[Tuple[str, float]] = []
+        self.stages: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def mark(self, name: str) -> float:
+        elapsed = time.perf_counter() - self.started
+        with self._lock:
+            self.milestones.append((name, elapsed))
+        self.metrics.set_gauge(f"startup.{name}.seconds", elapsed)
+        return elapsed
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stages.append((name, elapsed))
+            self.metrics.set_gauge(f"startup.{name}.seconds", elapsed)
+
+    def report(self) -> str:
+        # e.g. "Startup: window 0.09s, ready 0.62s (imports 0.31s, camera 0.48s, ...)"
+        with self._lock:
+            milestones = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.milestones)
+            stages = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.stages)
+        return f"Startup: {milestones}" + (f" ({stages})" if stages else "")
+
+
+STARTUP = StartupTimer()
+
+
+class SamplingProfiler:
+    # Statistical profiler: a background thread samples every other thread's
+    # current frame at a fixed interval. Off by default; toggle at runtime.
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.samples: Counter = Counter()
+        # Guards samples: the sampler thread adds keys while top() ranks them
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self) -> None:
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
+
+    def toggle(self) -> bool:
+        if self._running:
+            self.stop()
+        else:
+            self.start()
+        return self._running
+
+    def top(self, n: int = 25) -> List[Dict]:
+        with self._lock:
+            samples = self.samples.copy()
+        total = sum(samples.values()) or 1
+        return [
+            {"location": loc, "samples": count, "share": round(count / total, 4)}
+            for loc, count in samples.most_common(n)
+        ]
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while self._running:
+            locations = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                code = frame.f_code
+                locations.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+            with self._lock:
+                self.samples.update(locations)
+            time.sleep(self.interval)
+
+
+class MetricsExporter:
+    # Periodically writes METRICS snapshots to a JSON file and optionally
+    # serves them over a local HTTP endpoint:
+    #   GET /metrics         current snapshot
+    #   GET /profile         top profiler samples
+    #   GET /profile/start   start the sampling profiler
+    #   GET /profile/stop    stop it
+
+    def __init__(
+        self,
+        metrics: Metrics = METRICS,
+        snapshot_path: Optional[str] = "metrics.json",
+        interval: float = 5.0,
+        http_port: Optional[int] = None,
+        http_host: str = "127.0.0.1",
+        profiler: Optional[SamplingProfiler] = None,
+    ) -> None:
+        self.metrics = metrics
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self.http_port = http_port
+        self.http_host = http_host
+        self.profiler = profiler or SamplingProfiler()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._server: Optional["ThreadingHTTPServer"] = None
+
+    def start(self) -> None:
+        self._running = True
+        if self.snapshot_path:
+            self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+            self._thread.start()
+        if self.http_port is not None:
+            # Imported here: http.server is a noticeable share of startup and most runs never serve
+            from http.server import ThreadingHTTPServer
+
+            self._server = ThreadingHTTPServer((self.http_host, self.http_port), self._handler())
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self.profiler.stop()
+        if self.snapshot_path:
+            self.write_snapshot()
+
+    def write_snapshot(self) -> None:
+        # Write-then-rename so readers never see a half-written file
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.metrics.snapshot(), f)
+            os.replace(tmp_path, self.snapshot_path)
+        except Exception as e:
+            print(f"Failed to write metrics snapshot: {e}")
+
+    def _run(self) -> None:
+        while self._running:
+            time.sleep(self.interval)
+            if self._running:
+                self.write_snapshot()
+
+    def _handler(self):
+        from http.server import BaseHTTPRequestHandler
+
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = exporter.metrics.snapshot()
+                elif self.path == "/profile":
+                    body = {"running": exporter.profiler.running, "top": exporter.profiler.top()}
+                elif self.path == "/profile/start":
+                    exporter.profiler.start()
+                    body = {"running": True}
+                elif self.path == "/profile/stop":
+                    exporter.profiler.stop()
+                    body = {"running": False}
+                else:
+                    self.send_error(404)
+                    return
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import METRICS
+
+
+class QueueEmpty(Exception):
+    pass
+
+
+class DropOldestQueue:
+    # Bounded hand-off between stages; a full queue discards its oldest item
+    # so producers never block and consumers always get the freshest data
+
+    def __init__(self, maxsize: int = 1, name: str = "queue") -> None:
+        self._items: deque = deque(maxlen=max(1, maxsize))
+        self._cond = threading.Condition()
+        self.name = name
+        self.dropped = 0
+
+    def put(self, item: Any) -> None:
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+                METRICS.inc(f"queue.{self.name}.dropped")
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                raise QueueEmpty()
+            return self._items.popleft()
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+
+class Stage:
+    # One pipeline step running on its own worker thread.
+    # func receives the item from inbox (or nothing for a source stage) and
+    # returns the item for the next stage, or None to pass nothing on.
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Any],
+        inbox: Optional[DropOldestQueue] = None,
+        outbox: Optional[DropOldestQueue] = None,
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.fps = 0.0
+        self.processed = 0
+        self.errors = 0
+        self._window_start = time.perf_counter()
+        self._window_count = 0
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"stage-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0) -> None:
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        timer_name = f"stage.{self.name}.seconds"
+        while self._running:
+            try:
+                if self.inbox is None:
+                    start = time.perf_counter()
+                    result = self.func()
+                else:
+                    try:
+                        item = self.inbox.get(timeout=0.1)
+                    except QueueEmpty:
+                        continue
+                    start = time.perf_counter()
+                    result = self.func(item)
+            except Exception as e:
+                self.errors += 1
+                METRICS.inc(f"stage.{self.name}.errors")
+                print(f"Pipeline stage '{self.name}' error: {e}")
+                continue
+
+            if result is None:
+                continue
+            METRICS.observe(timer_name, time.perf_counter() - start)
+            self._count()
+            if self.outbox is not None:
+                self.outbox.put(result)
+
+    def _count(self) -> None:
+        self.processed += 1
+        self._window_count += 1
+        now = time.perf_counter()
+        elapsed = now - self._window_start
+        if elapsed >= 1.0:
+            self.fps = self._window_count / elapsed
+            METRICS.set_gauge(f"stage.{self.name}.fps", round(self.fps, 2))
+            self._window_start = now
+            self._window_count = 0
+
+
+class Pipeline:
+    # Linear chain of stages joined by drop-oldest queues
+
+    def __init__(self) -> None:
+        self.stages: List[Stage] = []
+
+    def add_stage(self, name: str, func: Callable[..., Any], queue_size: int = 1, inbox: Any = None) -> Stage:
+        # The first stage is the source, or reads from an external inbox (any
+        # object with get(timeout)/qsize()/dropped, e.g. capture.FrameMux);
+        # each later stage reads from a new queue of queue_size fed by the previous stage
+        if self.stages:
+            inbox = DropOldestQueue(queue_size, name=name)
+            self.stages[-1].outbox = inbox
+        stage = Stage(name, func, inbox=inbox)
+        self.stages.append(stage)
+        return stage
+
+    def start(self) -> None:
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self) -> None:
+        for stage in self.stages:
+            stage.stop()
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        # Per-stage throughput and the depth/drops of the queue feeding it
+        out: Dict[str, Dict[str, float]] = {}
+        for stage in self.stages:
+            out[stage.name] = {
+                "fps": round(stage.fps, 1),
+                "processed": stage.processed,
+                "errors": stage.errors,
+                "queue_depth": stage.inbox.qsize() if stage.inbox else 0,
+                "dropped": stage.inbox.dropped if stage.inbox else 0,
+            }
+        return out
@@ -0,0 +1,80 @@
+import hashlib
+import os
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from template_store import StoreError, read_store, write_store
+
+
+# Per-person sidecar in faces_db/<name>/ holding every sample already decoded
+# and resized, keyed by file name, mtime, size and content hash. A retrain
+# only stats the directory: unchanged files come straight from the
+# memory-mapped cache, touched-but-identical files are matched by hash, and
+# only new or edited images are decoded. Deleted files simply drop out.
+CACHE_FILE = ".samples.bin"
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _read_cache(cache_path: str, size: Tuple[int, int]) -> Tuple[Dict[str, Dict], Optional[np.ndarray]]:
+    if not os.path.exists(cache_path):
+        return {}, None
+    try:
+        # Small per-person file and read in full anyway, so check every byte
+        meta, arrays = read_store(cache_path, verify=True)
+        if tuple(meta.get("size", ())) != tuple(size):
+            return {}, None  # built for another template size
+        return meta["files"], arrays["samples"]
+    except (StoreError, KeyError, ValueError, OSError) as e:
+        print(f"Ignoring sample cache {cache_path}: {e}")
+        return {}, None
+
+
+def load_cached_samples(person_dir: str, filenames: List[str], size: Tuple[int, int]) -> List[np.ndarray]:
+    # Same result as decoding and resizing every file, in filenames order;
+    # rewrites the sidecar only when something changed
+    cache_path = os.path.join(person_dir, CACHE_FILE)
+    entries, rows = _read_cache(cache_path, size)
+    by_hash = {entry["hash"]: entry["row"] for entry in entries.values()}
+
+    new_entries: Dict[str, Dict] = {}
+    new_rows: List[np.ndarray] = []
+    changed = set(entries) != set(filenames)
+    for filename in filenames:
+        path = os.path.join(person_dir, filename)
+        try:
+            st = os.stat(path)
+        except OSError:
+            changed = True
+            continue
+        entry = entries.get(filename)
+        if entry is not None and entry["mtime_ns"] == st.st_mtime_ns and entry["bytes"] == st.st_size:
+            digest, row = entry["hash"], rows[entry["row"]]
+        else:
+            changed = True
+            with open(path, "rb") as f:
+                data = f.read()
+            digest = content_hash(data)
+            if digest in by_hash:
+                row = rows[by_hash[digest]]
+            else:
+                img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+                if img is None:
+                    continue
+                row = cv2.resize(img, size)
+        new_entries[filename] = {"mtime_ns": st.st_mtime_ns, "bytes": st.st_size, "hash": digest, "row": len(new_rows)}
+        new_rows.append(row)
+
+    # Copy out of the mapping before replacing the file (Windows can't replace a mapped file)
+    stacked = np.stack(new_rows) if new_rows else np.empty((0, size[1], size[0]), dtype=np.uint8)
+    del new_rows, rows
+    if changed:
+        try:
+            write_store(cache_path, {"size": list(size), "files": new_entries}, {"samples": stacked})
+        except OSError as e:
+            print(f"Failed to write sample cache {cache_path}: {e}")
+    return [np.float32(sample) for sample in stacked]
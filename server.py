@@ -0,0 +1,340 @@
+import argparse
+import base64
+import json
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from attendance import AttendanceManager
+from checkin import AutoCheckIn
+from config import load_config
+from detection import DetectorConfig, FaceDetector
+from engine import CASCADE_FILE, RecognitionEngine
+from face_db import FaceDatabase
+from matcher import TemplateConfig
+from metrics import METRICS
+
+
+# Local recognition service: one process holds the templates and the
+# attendance log, thin door clients (client.py) send it frames or face crops.
+#
+#   python server.py --port 8765 --window-ms 5
+#
+# POST /recognize  {"source": "door-a", "frame": "<base64 JPEG>"}, or
+#                  {"source": "door-a", "faces": ["<base64 JPEG>", ...]} for
+#                  faces the client already cropped; "log": false skips attendance
+#               -> {"results": [{"box", "name", "score", "recognized", "logged"}], "batch": n}
+#                  A person is logged once --min-hits recognitions from the same
+#                  source agree within --hit-window seconds, then not again for --cooldown
+# POST /reload     re-read the template store (e.g. after enroll.py)
+# GET  /health     people and template rows loaded
+# GET  /metrics    METRICS snapshot
+
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+MAX_BODY = 16 * 1024 * 1024
+
+
+class MicroBatcher:
+    # Faces from concurrent requests are held for up to `window` seconds
+    # after the first one arrives (or until max_batch faces are waiting) and
+    # scored together with one match_batch call, so each batch pays for one
+    # matrix product instead of one per request
+
+    def __init__(self, db: FaceDatabase, window: float = 0.005, max_batch: int = 64) -> None:
+        self.db = db
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: List[Tuple[Sequence[np.ndarray], Future]] = []
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(1.0)
+            self._thread = None
+
+    def submit(self, faces: Sequence[np.ndarray]) -> Tuple[List[Tuple[Optional[str], float]], int]:
+        # Blocks until the batch holding these faces is scored; returns the
+        # best (name, score) per face and the size of that batch
+        if len(faces) == 0:
+            return [], 0
+        future: Future = Future()
+        with self._cond:
+            self._pending.append((faces, future))
+            self._cond.notify()
+        return future.result()
+
+    def _waiting(self) -> int:
+        return sum(len(faces) for faces, _ in self._pending)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._running:
+                    break
+                deadline = time.perf_counter() + self.window
+                while self._running and self._waiting() < self.max_batch:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending = self._pending, []
+            self._score(batch)
+        for _, future in self._pending:
+            future.set_exception(RuntimeError("server is shutting down"))
+
+    def _score(self, batch: List[Tuple[Sequence[np.ndarray], Future]]) -> None:
+        faces = [face for request_faces, _ in batch for face in request_faces]
+        try:
+            with METRICS.timer("server.match.seconds"):
+                matches = self.db.matcher.match_batch(faces)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        METRICS.observe("server.batch.faces", len(faces), BATCH_BUCKETS)
+        METRICS.observe("server.batch.requests", len(batch), BATCH_BUCKETS)
+        offset = 0
+        for request_faces, future in batch:
+            best = [m[0] if m else (None, 0.0) for m in matches[offset:offset + len(request_faces)]]
+            future.set_result((best, len(faces)))
+            offset += len(request_faces)
+
+
+class RecognitionService:
+    # Detection runs on the request threads (one detector per thread),
+    # matching is micro-batched across requests, and attendance is written
+    # once per person per cooldown, whichever door saw them. A single match
+    # is not enough: min_hits recognitions of the same person from the same
+    # source must arrive within hit_window seconds, so one false positive
+    # can't log someone for a whole cooldown.
+
+    def __init__(
+        self,
+        db: FaceDatabase,
+        attendance: AttendanceManager,
+        detector_config: Optional[DetectorConfig] = None,
+        threshold: float = 0.6,
+        cooldown: float = 3600.0,
+        window: float = 0.005,
+        max_batch: int = 64,
+        min_hits: int = 3,
+        hit_window: float = 5.0,
+    ) -> None:
+        self.db = db
+        self.attendance = attendance
+        self.detector_config = detector_config or DetectorConfig()
+        self.threshold = threshold
+        self.min_hits = max(1, min_hits)
+        self.hit_window = hit_window
+        # (source, name) -> times of its recent recognitions, oldest first
+        self._hits: Dict[Tuple[Optional[str], str], List[float]] = {}
+        # Only AutoCheckIn's persisted last-logged map and cooldown are used here
+        self.checkin = AutoCheckIn(attendance, cooldown=cooldown, enabled=False)
+        self.batcher = MicroBatcher(db, window, max_batch)
+        self._local = threading.local()
+        self._log_lock = threading.Lock()
+
+    def start(self) -> None:
+        self.batcher.start()
+
+    def stop(self) -> None:
+        self.batcher.stop()
+        self.attendance.close()
+
+    def detector(self) -> FaceDetector:
+        detector = getattr(self._local, "detector", None)
+        if detector is None:
+            cascade = cv2.CascadeClassifier(cv2.data.haarcascades + CASCADE_FILE)
+            detector = self._local.detector = FaceDetector(cascade, self.detector_config)
+        return detector
+
+    def recognize(
+        self,
+        source: Optional[str] = None,
+        frame: Optional[np.ndarray] = None,
+        faces: Optional[Sequence[np.ndarray]] = None,
+        log: bool = True,
+    ) -> Dict:
+        # Either a frame (faces are detected here) or ready-cropped faces
+        if frame is not None:
+            gray = RecognitionEngine.to_gray(frame)
+            with METRICS.timer("server.detect.seconds"):
+                boxes = [tuple(int(v) for v in box) for box in self.detector().detect(gray)]
+            faces = [gray[y:y + h, x:x + w] for (x, y, w, h) in boxes]
+        else:
+            faces = [RecognitionEngine.to_gray(face) for face in faces or []]
+            boxes = [None] * len(faces)
+        METRICS.inc("server.requests")
+        METRICS.inc("server.faces", len(faces))
+
+        matches, batch = self.batcher.submit(faces)
+        results = []
+        for box, (name, score) in zip(boxes, matches):
+            recognized = name is not None and score > self.threshold
+            results.append({
+                "box": list(box) if box is not None else None,
+                "name": name,
+                "score": round(float(score), 4),
+                "recognized": recognized,
+                "logged": recognized and log and self._log(name, source),
+            })
+        return {"results": results, "batch": batch}
+
+    def _log(self, name: str, source: Optional[str]) -> bool:
+        now = time.time()
+        with self._log_lock:
+            if self.checkin.in_cooldown(name, now):
+                return False
+            # Forget stale hits of every (source, name) so the map stays small
+            for key in [k for k, times in self._hits.items() if now - times[-1] > self.hit_window]:
+                del self._hits[key]
+            times = [t for t in self._hits.get((source, name), []) if now - t <= self.hit_window]
+            times.append(now)
+            if len(times) < self.min_hits:
+                self._hits[(source, name)] = times
+                return False
+            self._hits.pop((source, name), None)
+            self.checkin.mark(name, now)
+        record = self.attendance.log(name, source=source)
+        print(f"Attendance logged: {record['name']} at {record['timestamp']} ({source or 'unknown source'})")
+        return True
+
+    def health(self) -> Dict:
+        return {"people": len(self.db.known_faces), "templates": self.db.matcher.rows}
+
+
+def decode_image(data: str) -> np.ndarray:
+    img = cv2.imdecode(np.frombuffer(base64.b64decode(data), dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise ValueError("could not decode image")
+    return img
+
+
+def make_handler(service: RecognitionService):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/health":
+                self._reply(200, service.health())
+            elif self.path == "/metrics":
+                self._reply(200, METRICS.snapshot())
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length > MAX_BODY:
+                self._reply(413, {"error": "request too large"})
+                return
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError as e:
+                self._reply(400, {"error": f"invalid JSON: {e}"})
+                return
+
+            if self.path == "/reload":
+                service.db.load()
+                self._reply(200, service.health())
+                return
+            if self.path != "/recognize":
+                self._reply(404, {"error": "not found"})
+                return
+            try:
+                frame = decode_image(body["frame"]) if body.get("frame") else None
+                faces = [decode_image(face) for face in body.get("faces") or []]
+            except Exception as e:
+                self._reply(400, {"error": f"bad image: {e}"})
+                return
+            try:
+                reply = service.recognize(body.get("source"), frame, faces, bool(body.get("log", True)))
+            except Exception as e:
+                METRICS.inc("server.errors")
+                self._reply(500, {"error": str(e)})
+                return
+            self._reply(200, reply)
+
+        def _reply(self, status, body):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def build_service(args: argparse.Namespace) -> RecognitionService:
+    config = load_config(args.config)
+    db = FaceDatabase(
+        faces_db_path=args.faces_db,
+        store_path=args.store,
+        template_config=TemplateConfig.from_dict(config.get("templates", {})),
+    )
+    db.load()
+    return RecognitionService(
+        db,
+        AttendanceManager(args.attendance, async_writes=True),
+        detector_config=DetectorConfig.from_dict(config.get("detection", {})),
+        threshold=args.threshold,
+        cooldown=args.cooldown,
+        window=args.window_ms / 1000.0,
+        max_batch=args.max_batch,
+        min_hits=args.min_hits,
+        hit_window=args.hit_window,
+    )
+
+
+def run(args: argparse.Namespace) -> None:
+    service = build_service(args)
+    service.start()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    health = service.health()
+    print(f"Serving {health['people']} people on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="FaceAttend local recognition service")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (0.0.0.0 for the whole LAN)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--window-ms", type=float, default=5.0, help="how long to gather concurrent requests")
+    parser.add_argument("--max-batch", type=int, default=64, help="faces that close a batch early")
+    parser.add_argument("--threshold", type=float, default=0.6, help="recognition threshold, 0-1")
+    parser.add_argument("--min-hits", type=int, default=3, help="agreeing recognitions from one source needed to log")
+    parser.add_argument("--hit-window", type=float, default=5.0, help="seconds in which those recognitions must arrive")
+    parser.add_argument("--cooldown", type=float, default=3600.0, help="seconds before a person is logged again")
+    parser.add_argument("--attendance", default="attendance.db", help="attendance store for all clients")
+    parser.add_argument("--config", help="settings JSON (default: $FACEATTEND_CONFIG or faceattend.json)")
+    parser.add_argument("--faces-db", default="faces_db")
+    parser.add_argument("--store", default="face_templates.bin")
+    return parser
+
+
+if __name__ == "__main__":
+    run(build_parser().parse_args())
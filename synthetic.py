@@ -0,0 +1,122 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+# Deterministic synthetic faces and frames for benchmarks. Each identity is
+# a set of drawing parameters; samples of it vary in shift, lighting and noise.
+
+FACE_SIZE = 100
+
+
+def identity_params(rng: np.random.Generator) -> Dict[str, float]:
+    return {
+        "skin": float(rng.uniform(110, 200)),
+        "face_w": float(rng.uniform(0.32, 0.42)),
+        "face_h": float(rng.uniform(0.42, 0.48)),
+        "eye_y": float(rng.uniform(0.36, 0.46)),
+        "eye_dx": float(rng.uniform(0.13, 0.2)),
+        "eye_r": float(rng.uniform(0.04, 0.07)),
+        "mouth_y": float(rng.uniform(0.66, 0.76)),
+        "mouth_w": float(rng.uniform(0.1, 0.2)),
+        "nose_len": float(rng.uniform(0.08, 0.16)),
+        "texture_seed": int(rng.integers(0, 2**31 - 1)),
+    }
+
+
+def render_face(
+    params: Dict[str, float],
+    rng: Optional[np.random.Generator] = None,
+    size: int = FACE_SIZE,
+    jitter: float = 0.03,
+    noise: float = 6.0,
+) -> np.ndarray:
+    # One grayscale uint8 sample of an identity; rng=None gives the clean face
+    s = size
+    dx = dy = 0.0
+    gain, bias = 1.0, 0.0
+    if rng is not None:
+        dx, dy = rng.uniform(-jitter, jitter, 2) * s
+        gain = float(rng.uniform(0.85, 1.15))
+        bias = float(rng.uniform(-15, 15))
+
+    img = np.full((s, s), 60, dtype=np.float32)
+    # Per-identity texture so identities differ beyond their geometry
+    tex_rng = np.random.default_rng(params["texture_seed"])
+    texture = cv2.resize(tex_rng.normal(0, 18, (8, 8)).astype(np.float32), (s, s), interpolation=cv2.INTER_CUBIC)
+
+    cx, cy = s / 2 + dx, s / 2 + dy
+    face = np.zeros((s, s), dtype=np.uint8)
+    cv2.ellipse(face, (int(cx), int(cy)), (int(params["face_w"] * s), int(params["face_h"] * s)), 0, 0, 360, 255, -1)
+    img[face > 0] = params["skin"] + texture[face > 0]
+
+    eye_y = int(params["eye_y"] * s + dy)
+    for side in (-1, 1):
+        ex = int(cx + side * params["eye_dx"] * s)
+        cv2.circle(img, (ex, eye_y), max(1, int(params["eye_r"] * s)), 30, -1)
+        cv2.line(img, (ex - int(0.08 * s), eye_y - int(0.08 * s)), (ex + int(0.08 * s), eye_y - int(0.09 * s)), 40, 2)
+    cv2.line(img, (int(cx), eye_y), (int(cx), int(eye_y + params["nose_len"] * s)), 90, 2)
+    mouth_y = int(params["mouth_y"] * s + dy)
+    half = int(params["mouth_w"] * s)
+    cv2.line(img, (int(cx) - half, mouth_y), (int(cx) + half, mouth_y), 50, 3)
+
+    img = img * gain + bias
+    if rng is not None and noise > 0:
+        img += rng.normal(0, noise, img.shape)
+    return np.clip(img, 0, 255).astype(np.uint8)
+
+
+def make_identities(people: int, seed: int = 0) -> Dict[str, Dict[str, float]]:
+    rng = np.random.default_rng(seed)
+    return {f"person_{i:04d}": identity_params(rng) for i in range(people)}
+
+
+def build_faces_db(
+    faces_db_path: str,
+    people: int,
+    samples: int,
+    seed: int = 0,
+) -> Tuple[Dict[str, int], Dict[str, Dict[str, float]]]:
+    # Write people x samples JPEGs in the faces_db/<name>/<i>.jpg layout.
+    # Returns (known_faces mapping, identity params).
+    identities = make_identities(people, seed)
+    rng = np.random.default_rng(seed + 1)
+    known_faces: Dict[str, int] = {}
+    for idx, (name, params) in enumerate(identities.items()):
+        person_dir = os.path.join(faces_db_path, name)
+        os.makedirs(person_dir, exist_ok=True)
+        for i in range(samples):
+            cv2.imwrite(os.path.join(person_dir, f"{i}.jpg"), render_face(params, rng))
+        known_faces[name] = idx
+    return known_faces, identities
+
+
+def make_frame(
+    width: int,
+    height: int,
+    faces: int,
+    identities: Optional[Dict[str, Dict[str, float]]] = None,
+    seed: int = 0,
+) -> Tuple[np.ndarray, List[Tuple[str, Tuple[int, int, int, int]]]]:
+    # BGR frame with `faces` synthetic faces pasted on a cluttered background.
+    # Returns (frame, [(name, box)]) for the faces placed.
+    rng = np.random.default_rng(seed)
+    background = cv2.resize(rng.integers(40, 200, (height // 16 + 1, width // 16 + 1)).astype(np.uint8), (width, height))
+    frame = cv2.cvtColor(background, cv2.COLOR_GRAY2BGR)
+    if identities is None:
+        identities = make_identities(max(faces, 1), seed)
+    names = list(identities.keys())
+
+    placed: List[Tuple[str, Tuple[int, int, int, int]]] = []
+    size = max(40, min(width, height) // 6)
+    cols = max(1, width // size)
+    for k in range(faces):
+        x = (k % cols) * size
+        y = ((k // cols) * size) % max(1, height - size)
+        name = names[k % len(names)]
+        face = cv2.resize(render_face(identities[name], rng), (size, size))
+        frame[y:y + size, x:x + size] = face[:, :, None]
+        placed.append((name, (x, y, size, size)))
+    return frame, placed
@@ -0,0 +1,98 @@
+import json
+import os
+import struct
+import zlib
+from typing import Any, Dict, Tuple
+
+import numpy as np
+
+
+# File layout:
+#   prefix   magic, format version, header length, header crc32
+#   header   UTF-8 JSON: caller metadata plus offset/shape/dtype/crc32 of each array
+#   arrays   raw little-endian array data, each starting on an ALIGN boundary
+MAGIC = b"FATS"
+VERSION = 1
+ALIGN = 64
+_PREFIX = struct.Struct("<4sHxxII")
+
+
+class StoreError(Exception):
+    pass
+
+
+def _aligned(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def write_store(path: str, meta: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> None:
+    # Atomic save: write a temp file next to path, fsync it, then rename over path
+    arrays = {name: np.ascontiguousarray(a, dtype=np.asarray(a).dtype.newbyteorder("<")) for name, a in arrays.items()}
+
+    # Offsets depend on the header size, which depends on the offsets;
+    # iterate until the header length settles
+    header_len = 0
+    while True:
+        entries = {}
+        offset = _aligned(_PREFIX.size + header_len)
+        for name, a in arrays.items():
+            entries[name] = {
+                "offset": offset,
+                "shape": list(a.shape),
+                "dtype": a.dtype.str,
+                "crc32": zlib.crc32(a.data) & 0xFFFFFFFF,
+            }
+            offset = _aligned(offset + a.nbytes)
+        header = json.dumps({"meta": meta, "arrays": entries}, sort_keys=True).encode("utf-8")
+        if len(header) == header_len:
+            break
+        header_len = len(header)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, VERSION, len(header), zlib.crc32(header) & 0xFFFFFFFF))
+        f.write(header)
+        for name, a in arrays.items():
+            f.seek(entries[name]["offset"])
+            f.write(a.data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_store(path: str, verify: bool = False) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+    # Returns (meta, arrays); arrays are read-only memory maps of the file,
+    # so opening is O(header) and the pages are shared between processes.
+    # The header checksum and array bounds are always checked; verify=True
+    # also checksums every array, which reads the whole file.
+    with open(path, "rb") as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) != _PREFIX.size:
+            raise StoreError(f"{path}: truncated header")
+        magic, version, header_len, header_crc = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise StoreError(f"{path}: not a template store")
+        if version > VERSION:
+            raise StoreError(f"{path}: format version {version} is newer than supported ({VERSION})")
+        header = f.read(header_len)
+    if len(header) != header_len or zlib.crc32(header) & 0xFFFFFFFF != header_crc:
+        raise StoreError(f"{path}: header checksum mismatch")
+    info = json.loads(header.decode("utf-8"))
+
+    size = os.path.getsize(path)
+    arrays: Dict[str, np.ndarray] = {}
+    for name, entry in info["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        shape = tuple(entry["shape"])
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        if nbytes == 0:
+            # Empty arrays may sit at an aligned offset past the end of the file
+            a = np.empty(shape, dtype=dtype)
+        elif entry["offset"] + nbytes > size:
+            raise StoreError(f"{path}: array '{name}' is truncated")
+        else:
+            a = np.memmap(path, dtype=dtype, mode="r", offset=entry["offset"], shape=shape)
+        if verify and zlib.crc32(a.data) & 0xFFFFFFFF != entry["crc32"]:
+            raise StoreError(f"{path}: array '{name}' checksum mismatch")
+        arrays[name] = a
+    return info["meta"], arrays
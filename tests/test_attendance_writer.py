@@ -0,0 +1,107 @@
+import json
+
+from attendance_store import AttendanceStore
+from attendance_writer import AsyncAttendanceWriter
+
+
+class ListStore(AttendanceStore):
+    def __init__(self, fail=False):
+        self.records = []
+        self.fail = fail
+
+    def add_many(self, records):
+        if self.fail:
+            raise OSError("disk full")
+        self.records.extend(records)
+
+
+def _record(i):
+    return {"name": f"person{i}", "timestamp": f"2024-01-01 10:00:{i:02d}"}
+
+
+def _write_journal(path, lines):
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(line + "\n")
+
+
+def test_records_reach_the_store_and_the_journal_is_emptied(tmp_path):
+    journal = str(tmp_path / "attendance.journal")
+    store = ListStore()
+    writer = AsyncAttendanceWriter(store, journal_path=journal, flush_interval=0.05)
+    for i in range(25):
+        writer.submit(_record(i))
+    assert writer.flush(5.0)
+    writer.close()
+    assert store.records == [_record(i) for i in range(25)]
+    with open(journal, encoding="utf-8") as f:
+        assert f.read() == ""
+
+
+def test_replay_skips_committed_entries(tmp_path):
+    journal = str(tmp_path / "attendance.journal")
+    _write_journal(journal, [
+        json.dumps({"s": 1, "r": _record(1)}),
+        json.dumps({"s": 2, "r": _record(2)}),
+        json.dumps({"c": 2}),
+        json.dumps({"s": 3, "r": _record(3)}),
+        json.dumps({"s": 4, "r": _record(4)}),
+    ])
+    store = ListStore()
+    writer = AsyncAttendanceWriter(store, journal_path=journal)
+    writer.close()
+    assert writer.recovered == 2
+    assert store.records == [_record(3), _record(4)]
+
+
+def test_replay_ignores_a_torn_final_line(tmp_path):
+    journal = str(tmp_path / "attendance.journal")
+    torn = json.dumps({"s": 2, "r": _record(2)})[:-7]
+    with open(journal, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"s": 1, "r": _record(1)}) + "\n" + torn)
+    store = ListStore()
+    writer = AsyncAttendanceWriter(store, journal_path=journal)
+    writer.close()
+    assert store.records == [_record(1)]
+
+
+def test_replay_uses_the_highest_commit_marker(tmp_path):
+    journal = str(tmp_path / "attendance.journal")
+    _write_journal(journal, [
+        json.dumps({"s": 1, "r": _record(1)}),
+        json.dumps({"s": 2, "r": _record(2)}),
+        json.dumps({"s": 3, "r": _record(3)}),
+        json.dumps({"c": 3}),
+        json.dumps({"c": 1}),
+    ])
+    store = ListStore()
+    writer = AsyncAttendanceWriter(store, journal_path=journal)
+    writer.close()
+    assert writer.recovered == 0
+    assert store.records == []
+
+
+def test_replayed_journal_is_not_replayed_twice(tmp_path):
+    journal = str(tmp_path / "attendance.journal")
+    _write_journal(journal, [json.dumps({"s": 1, "r": _record(1)})])
+    store = ListStore()
+    AsyncAttendanceWriter(store, journal_path=journal).close()
+    AsyncAttendanceWriter(store, journal_path=journal).close()
+    assert store.records == [_record(1)]
+
+
+def test_records_survive_a_failing_store_until_the_next_start(tmp_path):
+    journal = str(tmp_path / "attendance.journal")
+    failing = ListStore(fail=True)
+    writer = AsyncAttendanceWriter(failing, journal_path=journal, flush_interval=0.05)
+    writer.submit(_record(1))
+    writer.submit(_record(2))
+    assert not writer.flush(0.3)
+    writer.close(0.3)
+    assert failing.records == []
+
+    store = ListStore()
+    recovered = AsyncAttendanceWriter(store, journal_path=journal)
+    recovered.close()
+    assert recovered.recovered == 2
+    assert store.records == [_record(1), _record(2)]
@@ -0,0 +1,116 @@
+import os
+import struct
+
+import numpy as np
+import pytest
+
+from template_store import MAGIC, VERSION, StoreError, read_store, write_store
+
+
+def _arrays():
+    rng = np.random.default_rng(0)
+    return {
+        "templates": rng.random((5, 8, 8), dtype=np.float32),
+        "labels": np.arange(7, dtype=np.int32),
+        "half": rng.random((3, 4)).astype(np.float16),
+        "pixels": rng.integers(0, 256, (2, 6), dtype=np.uint8),
+        "empty": np.empty((0, 8, 8), dtype=np.float32),
+    }
+
+
+def _flip_byte(path, offset):
+    with open(path, "r+b") as f:
+        f.seek(offset)
+        byte = f.read(1)
+        f.seek(offset)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "store.bin")
+    meta = {"names": ["alice", "bob"], "counts": {"alice": 3}}
+    arrays = _arrays()
+    write_store(path, meta, arrays)
+
+    loaded_meta, loaded = read_store(path, verify=True)
+    assert loaded_meta == meta
+    assert set(loaded) == set(arrays)
+    for name, a in arrays.items():
+        assert loaded[name].dtype == a.dtype
+        assert loaded[name].shape == a.shape
+        np.testing.assert_array_equal(loaded[name], a)
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_arrays_are_read_only_maps(tmp_path):
+    path = str(tmp_path / "store.bin")
+    write_store(path, {}, {"templates": np.ones((2, 3), dtype=np.float32)})
+    _, arrays = read_store(path)
+    with pytest.raises(ValueError):
+        arrays["templates"][0, 0] = 2.0
+
+
+def test_rewrite_replaces_previous_contents(tmp_path):
+    path = str(tmp_path / "store.bin")
+    write_store(path, {"v": 1}, {"a": np.zeros(100, dtype=np.float32)})
+    write_store(path, {"v": 2}, {"a": np.ones(3, dtype=np.float32)})
+    meta, arrays = read_store(path, verify=True)
+    assert meta == {"v": 2}
+    np.testing.assert_array_equal(arrays["a"], np.ones(3, dtype=np.float32))
+
+
+def test_header_corruption_is_detected(tmp_path):
+    path = str(tmp_path / "store.bin")
+    write_store(path, {"names": ["alice"]}, _arrays())
+    _flip_byte(path, struct.calcsize("<4sHxxII") + 3)
+    with pytest.raises(StoreError, match="header checksum"):
+        read_store(path)
+
+
+def test_array_corruption_is_detected_only_when_verifying(tmp_path):
+    path = str(tmp_path / "store.bin")
+    arrays = _arrays()
+    write_store(path, {}, arrays)
+    _flip_byte(path, os.path.getsize(path) - 1)
+
+    _, loaded = read_store(path)  # lazy load: header only
+    assert set(loaded) == set(arrays)
+    with pytest.raises(StoreError, match="checksum mismatch"):
+        read_store(path, verify=True)
+
+
+def test_truncated_array_is_detected(tmp_path):
+    path = str(tmp_path / "store.bin")
+    write_store(path, {}, {"templates": np.ones((50, 50), dtype=np.float32)})
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 100)
+    with pytest.raises(StoreError, match="truncated"):
+        read_store(path)
+
+
+def test_truncated_header_is_detected(tmp_path):
+    path = str(tmp_path / "store.bin")
+    write_store(path, {"names": ["alice"] * 50}, {"a": np.ones(4, dtype=np.float32)})
+    with open(path, "r+b") as f:
+        f.truncate(20)
+    with pytest.raises(StoreError):
+        read_store(path)
+    with open(path, "r+b") as f:
+        f.truncate(5)
+    with pytest.raises(StoreError, match="truncated header"):
+        read_store(path)
+
+
+def test_foreign_and_newer_files_are_rejected(tmp_path):
+    path = str(tmp_path / "store.bin")
+    with open(path, "wb") as f:
+        f.write(b"PK\x03\x04" + b"\x00" * 64)
+    with pytest.raises(StoreError, match="not a template store"):
+        read_store(path)
+
+    write_store(path, {}, {"a": np.ones(4, dtype=np.float32)})
+    with open(path, "r+b") as f:
+        f.seek(len(MAGIC))
+        f.write(struct.pack("<H", VERSION + 1))
+    with pytest.raises(StoreError, match="newer"):
+        read_store(path)
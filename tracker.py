@@ -0,0 +1,189 @@
+import copy
+import threading
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+Box = Tuple[int, int, int, int]
+
+THUMB_SIZE = (16, 16)
+
+
+def iou(a: Box, b: Box) -> float:
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+def roi_thumbnail(gray: np.ndarray, box: Box) -> Optional[np.ndarray]:
+    # Tiny normalized signature of a box's contents, cheap enough to compute every frame
+    x, y, w, h = box
+    roi = gray[max(0, y):y + h, max(0, x):x + w]
+    if roi.size == 0:
+        return None
+    thumb = np.float32(cv2.resize(roi, THUMB_SIZE, interpolation=cv2.INTER_AREA)).reshape(-1)
+    thumb -= thumb.mean()
+    norm = float(np.linalg.norm(thumb))
+    return thumb / norm if norm > 0 else thumb
+
+
+class Track:
+    # One face followed across frames, with its cached identity
+
+    def __init__(self, track_id: int, box: Box) -> None:
+        self.track_id = track_id
+        self.box = box
+        self.name: Optional[str] = None
+        self.score = 0.0
+        self.confidence = 1.0
+        self.missed = 0
+        self.recognized_frame: Optional[int] = None
+        self.detected_frame: Optional[int] = None  # last frame the cascade placed this box
+        self.confirmations = 0  # recognitions in a row that agreed on name
+        self.matcher: Any = None
+        self.thumb: Optional[np.ndarray] = None
+
+
+class FaceTracker:
+    # Associates detections across frames by IoU (or centroid distance) and
+    # decides when detection and recognition actually need to run again
+
+    def __init__(
+        self,
+        detect_interval: int = 10,
+        recognize_interval: int = 90,
+        min_confidence: float = 0.6,
+        iou_threshold: float = 0.3,
+        max_missed: int = 2,
+        confirm_frames: int = 1,
+    ) -> None:
+        self.detect_interval = detect_interval
+        self.recognize_interval = recognize_interval
+        self.min_confidence = min_confidence
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        # A new identity is re-recognized on every frame until this many
+        # recognitions agree, before it is cached for recognize_interval frames
+        self.confirm_frames = confirm_frames
+
+        self.frame_index = 0
+        self.tracks: List[Track] = []
+        self._last_detect: Optional[int] = None
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def step(self, gray: np.ndarray, detect: Callable[[np.ndarray], Sequence[Box]]) -> List[Track]:
+        # Advance one frame; detect() is only called when the tracks can't be trusted.
+        # Returns copies of the live tracks, safe to hand to another thread.
+        with self._lock:
+            self.frame_index += 1
+            if self._should_detect():
+                boxes = [tuple(int(v) for v in b) for b in detect(gray)]
+                self._associate(boxes)
+                self._last_detect = self.frame_index
+            self._refresh_confidence(gray)
+            return [copy.copy(t) for t in self.tracks]
+
+    def needs_recognition(self, track: Track, matcher: Any) -> bool:
+        if track.recognized_frame is None or track.matcher is not matcher:
+            return True
+        if track.confirmations < self.confirm_frames:
+            return True
+        if track.confidence < self.min_confidence:
+            return True
+        return self.frame_index - track.recognized_frame >= self.recognize_interval
+
+    def set_identity(self, track: Track, gray: np.ndarray, name: Optional[str], score: float, matcher: Any) -> None:
+        # Cache a recognition result on the live track and on the caller's copy
+        thumb = roi_thumbnail(gray, track.box)
+        with self._lock:
+            live = [t for t in self.tracks if t.track_id == track.track_id]
+            previous = live[0] if live else track
+            confirmations = previous.confirmations + 1 if previous.name == name else 1
+            for t in [track] + live:
+                t.confirmations = confirmations
+                t.name = name
+                t.score = score
+                t.confidence = 1.0
+                t.recognized_frame = self.frame_index
+                t.matcher = matcher
+                t.thumb = thumb
+
+    def reset(self) -> None:
+        with self._lock:
+            self.tracks = []
+            self._last_detect = None
+
+    def _should_detect(self) -> bool:
+        if self._last_detect is None:
+            return True
+        if self.frame_index - self._last_detect >= self.detect_interval:
+            return True
+        return any(t.confidence < self.min_confidence for t in self.tracks)
+
+    def _associate(self, boxes: List[Box]) -> None:
+        # Greedy matching: best IoU pairs first, then nearest centroids for the rest
+        pairs = []
+        for ti, track in enumerate(self.tracks):
+            for bi, box in enumerate(boxes):
+                overlap = iou(track.box, box)
+                if overlap >= self.iou_threshold:
+                    pairs.append((overlap, ti, bi))
+        pairs.sort(reverse=True)
+
+        used_tracks, used_boxes = set(), set()
+        for _, ti, bi in pairs:
+            if ti in used_tracks or bi in used_boxes:
+                continue
+            used_tracks.add(ti)
+            used_boxes.add(bi)
+            self.tracks[ti].box = boxes[bi]
+            self.tracks[ti].missed = 0
+            self.tracks[ti].detected_frame = self.frame_index
+
+        for ti, track in enumerate(self.tracks):
+            if ti in used_tracks:
+                continue
+            tx, ty, tw, th = track.box
+            best, best_dist = None, 0.5 * max(tw, th)
+            for bi, (x, y, w, h) in enumerate(boxes):
+                if bi in used_boxes:
+                    continue
+                dist = float(np.hypot((x + w / 2) - (tx + tw / 2), (y + h / 2) - (ty + th / 2)))
+                if dist < best_dist:
+                    best, best_dist = bi, dist
+            if best is not None:
+                used_tracks.add(ti)
+                used_boxes.add(best)
+                track.box = boxes[best]
+                track.missed = 0
+                track.detected_frame = self.frame_index
+
+        survivors = []
+        for ti, track in enumerate(self.tracks):
+            if ti not in used_tracks:
+                track.missed += 1
+                if track.missed > self.max_missed:
+                    continue
+            survivors.append(track)
+        for bi, box in enumerate(boxes):
+            if bi not in used_boxes:
+                track = Track(self._next_id, box)
+                track.detected_frame = self.frame_index
+                survivors.append(track)
+                self._next_id += 1
+        self.tracks = survivors
+
+    def _refresh_confidence(self, gray: np.ndarray) -> None:
+        # Confidence = similarity of the box contents now vs. when last recognized
+        for track in self.tracks:
+            if track.thumb is None:
+                continue
+            current = roi_thumbnail(gray, track.box)
+            track.confidence = float(np.dot(current, track.thumb)) if current is not None else 0.0